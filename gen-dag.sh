@@ -3,13 +3,19 @@ set -efuo pipefail
 
 views=${*:-core wallet tfl halo2 zf}
 
+export DATA_STORE=${DATA_STORE:-data/store.sqlite3}
+mkdir -p "$(dirname "${DATA_STORE}")"
+
+echo Syncing data store...
+GITHUB_TOKEN="$(cat GITHUB_TOKEN)" \
+ZENHUB_TOKEN="$(cat ZENHUB_TOKEN)" \
+uv run ./sync-store.py
+
 for view in ${views}
 do
     echo Generating ${view} DAG...
     DAG_VIEW=${view} \
     SHOW_MILESTONES=true \
     SHOW_EPICS=true \
-    GITHUB_TOKEN="$(cat GITHUB_TOKEN)" \
-    ZENHUB_TOKEN="$(cat ZENHUB_TOKEN)" \
     uv run ./zcash-issue-dag.py
 done
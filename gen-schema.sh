@@ -1,6 +1,13 @@
 #!/usr/bin/env bash
 set -eu
 
+# Pass `--prune` to trim each schema down to the types and fields reachable from the
+# queries that this project sends, before generating the sgqlc modules.
+prune=false
+if [ "${1:-}" = "--prune" ]; then
+  prune=true
+fi
+
 uv run python3 -m sgqlc.introspection \
   --exclude-deprecated \
   --exclude-description \
@@ -8,6 +15,10 @@ uv run python3 -m sgqlc.introspection \
   https://api.github.com/graphql \
   github_schema.json
 
+if [ "${prune}" = "true" ]; then
+  uv run ./prune-schema.py github github_schema.json
+fi
+
 uv run sgqlc-codegen schema github_schema.json github_schema.py
 
 uv run python3 -m sgqlc.introspection \
@@ -16,4 +27,8 @@ uv run python3 -m sgqlc.introspection \
   https://api.zenhub.com/public/graphql \
   zenhub_schema.json
 
+if [ "${prune}" = "true" ]; then
+  uv run ./prune-schema.py zenhub zenhub_schema.json
+fi
+
 uv run sgqlc-codegen schema zenhub_schema.json zenhub_schema.py
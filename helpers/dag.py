@@ -0,0 +1,243 @@
+from collections import deque
+
+import networkx as nx
+
+
+# Returns the subgraph of `dg` induced by `sources` and all of their ancestors.
+#
+# This performs a single reverse breadth-first search from all of `sources` at once, so
+# each node is visited at most once no matter how many sources share its ancestry. The
+# returned graph is a new `nx.DiGraph` (not a view), with node and edge attributes copied.
+#
+# Every in-edge of a visited node has a visited source, so the induced subgraph is exactly
+# the set of in-edges of the visited nodes, which we collect during the traversal.
+#
+# If `feeds` is true, also returns a dict mapping each node in the subgraph to the set of
+# `sources` that it is an ancestor of (or is).
+def ancestor_subgraph(dg, sources, feeds=False):
+    sources = set(sources)
+    for n in sources:
+        if n not in dg:
+            raise nx.NetworkXError('The node %s is not in the digraph.' % (n,))
+
+    sub = nx.DiGraph()
+    sub.add_nodes_from((n, dg.nodes[n]) for n in sources)
+
+    queue = deque(sources)
+    while queue:
+        n = queue.popleft()
+        for (pred, attrs) in dg.pred[n].items():
+            if pred not in sub:
+                sub.add_node(pred, **dg.nodes[pred])
+                queue.append(pred)
+            sub.add_edge(pred, n, **attrs)
+
+    if not feeds:
+        return sub
+
+    # Propagate the terminating issues backwards along edges, visiting each node after
+    # all of its successors.
+    fed = {}
+    for n in reversed(list(nx.topological_sort(sub))):
+        acc = set([n]) if n in sources else set()
+        for succ in sub.succ[n]:
+            acc |= fed[succ]
+        fed[n] = acc
+
+    return sub, fed
+
+
+# Returns the set of `sources` and all of their descendants in `dg`, found with a single
+# breadth-first search from all of `sources` at once.
+def descendant_set(dg, sources):
+    visited = set(sources)
+    queue = deque(visited)
+    while queue:
+        node = queue.popleft()
+        for succ in dg.successors(node):
+            if succ not in visited:
+                visited.add(succ)
+                queue.append(succ)
+    return visited
+
+
+# Critical-path analysis of a DAG of tasks, in time linear in its size.
+#
+# Each node takes `weight(n)` units of work (e.g. 1 for an open issue and 0 for a closed
+# one). Returns three dicts over the nodes of `dg`:
+#
+# - `length`: the weight of the heaviest path ending at (and including) the node, i.e.
+#   the earliest that it can be finished.
+# - `slack`: how much heavier the heaviest path through the node could become before it
+#   delays the completion of one of `targets`, or `None` if it has no target downstream.
+#   Nodes with a slack of zero are on a critical path.
+# - `prev`: the predecessor on the heaviest path ending at the node, or `None` if no path
+#   ending at the node has any weight before it.
+def critical_paths(dg, weight, targets):
+    order = list(nx.topological_sort(dg))
+
+    length = {}
+    prev = {}
+    for n in order:
+        (best, via) = (0, None)
+        for p in dg.pred[n]:
+            if length[p] > best:
+                (best, via) = (length[p], p)
+        length[n] = best + weight(n)
+        prev[n] = via
+
+    # The latest that each node can be finished without delaying a target downstream.
+    latest = {}
+    for n in reversed(order):
+        acc = length[n] if n in targets else None
+        for s in dg.succ[n]:
+            if latest[s] is not None:
+                limit = latest[s] - weight(s)
+                acc = limit if acc is None else min(acc, limit)
+        latest[n] = acc
+
+    slack = {n: None if latest[n] is None else latest[n] - length[n] for n in order}
+    return (length, slack, prev)
+
+
+# Returns the heaviest path ending at `n`, from the `prev` returned by `critical_paths`.
+def critical_path(prev, n):
+    path = []
+    while n is not None:
+        path.append(n)
+        n = prev[n]
+    path.reverse()
+    return path
+
+
+# A reachability index over a directed graph, which answers ancestor and descendant
+# queries without traversing the graph.
+#
+# Each node is numbered by its position in `self.nodes`, and has bitsets (stored as
+# Python integers) of the numbers of its ancestors and of its descendants. These are
+# computed in one pass over the condensation of the graph in topological order, so nodes
+# in a cycle share their sets. As in `nx.ancestors` and `nx.descendants`, a node is never
+# its own ancestor or descendant.
+#
+# `is_ancestor` takes constant time, and `ancestors` and `descendants` take time linear
+# in the size of their result. Passing `within=self.bits(nodes)` restricts a result to
+# `nodes`, which is how callers query a graph that they have since removed nodes from.
+class Reachability:
+    def __init__(self, dg):
+        self.nodes = list(dg.nodes)
+        self.index = {n: i for (i, n) in enumerate(self.nodes)}
+        self.edges = set(dg.edges)
+
+        cg = nx.condensation(dg)
+        members = {c: self.bits(cg.nodes[c]['members']) for c in cg}
+        cyclic = set(c for c in cg if len(cg.nodes[c]['members']) > 1)
+        for (u, v) in dg.edges:
+            if u == v:
+                cyclic.add(cg.graph['mapping'][u])
+
+        order = list(nx.topological_sort(cg))
+        anc = {}
+        for c in order:
+            acc = members[c] if c in cyclic else 0
+            for p in cg.pred[c]:
+                acc |= anc[p] | members[p]
+            anc[c] = acc
+        desc = {}
+        for c in reversed(order):
+            acc = members[c] if c in cyclic else 0
+            for s in cg.succ[c]:
+                acc |= desc[s] | members[s]
+            desc[c] = acc
+
+        mapping = cg.graph['mapping']
+        self.anc = [anc[mapping[n]] & ~(1 << i) for (i, n) in enumerate(self.nodes)]
+        self.desc = [desc[mapping[n]] & ~(1 << i) for (i, n) in enumerate(self.nodes)]
+
+    # Returns the bitset of the given nodes, ignoring any that aren't in the index.
+    def bits(self, nodes):
+        acc = 0
+        for n in nodes:
+            i = self.index.get(n)
+            if i is not None:
+                acc |= 1 << i
+        return acc
+
+    def _members(self, bits):
+        ret = []
+        while bits:
+            low = bits & -bits
+            ret.append(self.nodes[low.bit_length() - 1])
+            bits ^= low
+        return ret
+
+    def is_ancestor(self, a, b):
+        return (self.anc[self.index[b]] >> self.index[a]) & 1 == 1
+
+    def ancestors(self, n, within=-1):
+        return self._members(self.anc[self.index[n]] & within)
+
+    def descendants(self, n, within=-1):
+        return self._members(self.desc[self.index[n]] & within)
+
+    def descendant_count(self, n, within=-1):
+        return bin(self.desc[self.index[n]] & within).count('1')
+
+    def add_node(self, n):
+        if n not in self.index:
+            self.index[n] = len(self.nodes)
+            self.nodes.append(n)
+            self.anc.append(0)
+            self.desc.append(0)
+
+    # Adds the edge `(u, v)`, updating the sets of every node whose reachability changes.
+    # Returns `False` without changing the index if the edge would create a cycle, in which
+    # case the index must be rebuilt.
+    def add_edge(self, u, v):
+        self.add_node(u)
+        self.add_node(v)
+        (iu, iv) = (self.index[u], self.index[v])
+        if iu == iv or (self.desc[iv] >> iu) & 1:
+            return False
+
+        self.edges.add((u, v))
+        if (self.desc[iu] >> iv) & 1:
+            # `v` was already reachable from `u`.
+            return True
+
+        up = self.anc[iu] | (1 << iu)
+        down = self.desc[iv] | (1 << iv)
+        for i in self._indices(down):
+            self.anc[i] |= up
+        for i in self._indices(up):
+            self.desc[i] |= down
+        return True
+
+    def _indices(self, bits):
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+
+    # Brings the index up to date with `dg`, which must contain every edge already in the
+    # index. Returns `False` if it doesn't, or if a new edge creates a cycle, in which case
+    # the index must be rebuilt.
+    def update(self, dg):
+        edges = set(dg.edges)
+        if not self.edges <= edges:
+            return False
+        for n in dg.nodes:
+            self.add_node(n)
+        for (u, v) in edges - self.edges:
+            if not self.add_edge(u, v):
+                return False
+        return True
+
+    # Returns a copy of the index with the nodes renamed by `mapping`.
+    def relabel(self, mapping):
+        ret = Reachability.__new__(Reachability)
+        ret.nodes = [mapping.get(n, n) for n in self.nodes]
+        ret.index = {n: i for (i, n) in enumerate(ret.nodes)}
+        ret.edges = set((mapping.get(u, u), mapping.get(v, v)) for (u, v) in self.edges)
+        ret.anc = list(self.anc)
+        ret.desc = list(self.desc)
+        return ret
@@ -0,0 +1,124 @@
+import json
+import os
+import time
+
+from helpers import github, zenhub
+
+# The path of the index of every epic that we have seen, which is kept between runs so
+# that we only fetch what changed. By default it is kept next to the data store at
+# DATA_STORE, and not kept at all if that isn't set. Set to an empty string to disable
+# the index.
+EPIC_INDEX = os.environ.get('EPIC_INDEX', os.path.join(
+    os.path.dirname(os.environ['DATA_STORE']), 'epic-index.json',
+) if os.environ.get('DATA_STORE') else '')
+
+# The maximum age in hours of an epic's entry in the index. A change to an epic's issues
+# usually changes the `updatedAt` of its GitHub issue, but not always (e.g. if it is only
+# made in ZenHub), so we periodically fetch them (and check closed epics) regardless.
+EPIC_INDEX_MAX_AGE = float(os.environ.get('EPIC_INDEX_MAX_AGE', '24'))
+
+# The GitHub fields of an epic that we index.
+INDEX_FIELDS = github.Projection(['state', 'title', 'updatedAt'])
+
+
+# An index of the epics in each ZenHub workspace, stored at `path`. Each epic's entry
+# holds its GitHub issue, and its state, title and `updatedAt` as of the last time we
+# checked it. Open epics also hold their issues, along with the `updatedAt` they were
+# fetched at.
+#
+# Epics that are known to be closed aren't checked again until their entry expires, and
+# the issues of an open epic are only fetched again when its `updatedAt` changes.
+class EpicIndex:
+    def __init__(self, path):
+        self.path = path
+        self.workspaces = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.workspaces = json.load(f)
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = '%s.tmp' % self.path
+        with open(tmp, 'w') as f:
+            json.dump(self.workspaces, f, indent=2, sort_keys=True)
+            f.write('\n')
+        os.replace(tmp, self.path)
+
+    # Lists the epics in `workspace_id` within `repos`, and checks those that aren't known
+    # to be closed. Returns `(epic_id, epic)` for each of them, where `epic` is a
+    # `GitHubIssue` with (at least) `projection` if it was checked, and otherwise its
+    # indexed state and title. Epics outside `REPOS` are returned as closed.
+    def refresh(self, gapi, zapi, workspace_id, repos, REPOS, projection=INDEX_FIELDS):
+        epics = zenhub.get_epics(zapi, workspace_id, repos)
+        entries = self.workspaces.setdefault(workspace_id, {})
+        now = time.time()
+
+        # Forget the epics within `repos` that no longer exist.
+        repo_ids = set(repo.gh_id for repo in repos)
+        current = set(epic_id for (epic_id, _) in epics)
+        for epic_id in [k for (k, v) in entries.items() if v['issue'][0] in repo_ids and k not in current]:
+            del entries[epic_id]
+
+        known_closed = set(
+            epic_id for (epic_id, entry) in entries.items()
+            if entry['state'] == 'closed' and now - entry['checked_at'] < EPIC_INDEX_MAX_AGE * 3600
+        )
+        check = [gh_ref for (epic_id, gh_ref) in epics if gh_ref[0] in REPOS and epic_id not in known_closed]
+        print('Checking %d of %d epics' % (len(check), len(epics)))
+        checked = github.download_issues(gapi, check, REPOS, projection | INDEX_FIELDS)
+
+        ret = []
+        for (epic_id, (repo, number)) in epics:
+            if repo not in REPOS:
+                ret.append((epic_id, github.GitHubIssue(repo, number, None, REPOS)))
+                continue
+
+            entry = entries.get(epic_id)
+            if (repo, number) in checked:
+                epic = checked[(repo, number)]
+                if entry is None or entry['issue'] != [repo.gh_id, number]:
+                    entry = entries[epic_id] = {'issue': [repo.gh_id, number]}
+                entry.update({
+                    'state': epic.state,
+                    'title': epic.title,
+                    'updated_at': epic.updated_at,
+                    'checked_at': now,
+                })
+                if epic.state == 'closed':
+                    entry.pop('issues', None)
+            elif epic_id in known_closed:
+                epic = github.GitHubIssue(repo, number, {
+                    'state': 'CLOSED',
+                    'title': entry['title'],
+                    'updatedAt': entry['updated_at'],
+                }, REPOS)
+            else:
+                # We couldn't fetch it.
+                epic = github.GitHubIssue(repo, number, None, REPOS)
+            ret.append((epic_id, epic))
+
+        self._save()
+        return ret
+
+    # Returns the issues in the epic `epic_id` (as returned by `zenhub.get_epic_issues`),
+    # fetching them only if they may have changed since we last did.
+    def get_epic_issues(self, zapi, workspace_id, epic_id):
+        entry = self.workspaces.get(workspace_id, {}).get(epic_id)
+        if (
+            entry is not None and 'issues' in entry
+            and entry['issues_updated_at'] == entry['updated_at']
+            and time.time() - entry['issues_fetched_at'] < EPIC_INDEX_MAX_AGE * 3600
+        ):
+            return [(zenhub.repo_lookup(repo), number) for (repo, number) in entry['issues']]
+
+        issues = zenhub.get_epic_issues(zapi, workspace_id, epic_id)
+        if entry is not None:
+            entry.update({
+                'issues': [[repo.gh_id, number] for (repo, number) in issues],
+                'issues_updated_at': entry['updated_at'],
+                'issues_fetched_at': time.time(),
+            })
+            self._save()
+        return issues
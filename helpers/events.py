@@ -0,0 +1,150 @@
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+from helpers import github, zenhub
+from helpers.repos import ALL_REPOS
+
+# Applies GitHub webhook events, and ZenHub dependency and epic events, to a `store.Store`.
+#
+# A feed contains one event per line, as a JSON object `{"event": NAME, "payload": ...}`.
+# For GitHub events, NAME is the `X-GitHub-Event` header of the webhook delivery and the
+# payload is its body; we handle:
+#
+# - `issues` and `pull_request`: the issue or PR in the payload replaces the stored one.
+# - `label`: `edited` renames a label in the repository (with `changes.name.from`), and
+#   `deleted` removes it.
+# - `milestone`: `edited` renames a milestone (with `changes.title.from`), and `deleted`
+#   removes it.
+#
+# ZenHub doesn't send webhooks for dependencies or epics, so we define our own:
+#
+# - `zenhub_dependency`, with `action` either `added` or `removed`, and a payload of
+#   `{"workspace_id": ID, "blocking": ISSUE, "blocked": ISSUE}`.
+# - `zenhub_epic_issue`, with `action` either `added` or `removed`, and a payload of
+#   `{"workspace_id": ID, "epic_id": ID, "issue": ISSUE}`.
+#
+# where ISSUE is `{"repository_id": GH_ID, "number": NUMBER}`.
+
+# How often to check a followed file for new events, in seconds.
+POLL_INTERVAL = 0.5
+
+
+def _issue(payload, key):
+    issue = payload[key]
+    repo = zenhub.repo_lookup(payload['repository']['id'])
+    data = {
+        'state': issue['state'].upper(),
+        'title': issue['title'],
+        'url': issue['html_url'],
+        'labels': {'nodes': [{'name': label['name']} for label in issue['labels']]},
+        'milestone': issue['milestone'],
+        'updatedAt': issue['updated_at'],
+    }
+    if key == 'pull_request':
+        data['merged'] = issue.get('merged')
+    return github.GitHubIssue(repo, issue['number'], data, ALL_REPOS)
+
+
+def _ref(issue):
+    return (issue['repository_id'], issue['number'])
+
+
+# Applies a single event to `db`. Returns whether the event was understood.
+def apply(db, event):
+    name = event.get('event')
+    payload = event.get('payload', {})
+    action = payload.get('action')
+
+    if name == 'issues' and 'issue' in payload:
+        db.put_issues([_issue(payload, 'issue')])
+    elif name == 'pull_request' and 'pull_request' in payload:
+        db.put_issues([_issue(payload, 'pull_request')])
+    elif name == 'label' and action in ['edited', 'deleted']:
+        old = payload.get('changes', {}).get('name', {}).get('from', payload['label']['name'])
+        db.rename_label(
+            payload['repository']['id'],
+            old,
+            None if action == 'deleted' else payload['label']['name'],
+        )
+    elif name == 'milestone' and action in ['edited', 'deleted']:
+        old = payload.get('changes', {}).get('title', {}).get('from', payload['milestone']['title'])
+        db.rename_milestone(
+            payload['repository']['id'],
+            old,
+            None if action == 'deleted' else payload['milestone']['title'],
+        )
+    elif name == 'zenhub_dependency' and action in ['added', 'removed']:
+        update = db.add_edge if action == 'added' else db.remove_edge
+        update(payload['workspace_id'], _ref(payload['blocking']), _ref(payload['blocked']))
+    elif name == 'zenhub_epic_issue' and action in ['added', 'removed']:
+        update = db.add_epic_issue if action == 'added' else db.remove_epic_issue
+        update(payload['workspace_id'], payload['epic_id'], _ref(payload['issue']))
+    else:
+        return False
+    return True
+
+
+def _parse(line):
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        print('Ignoring malformed event: %s' % line)
+        return None
+
+
+def _read_lines(f, events):
+    for line in f:
+        event = _parse(line)
+        if event is not None:
+            events.put(event)
+
+
+def _follow(path, events):
+    with open(path) as f:
+        line = ''
+        while True:
+            line += f.readline()
+            if not line.endswith('\n'):
+                # Wait for the rest of the line to be written.
+                time.sleep(POLL_INTERVAL)
+                continue
+            (event, line) = (_parse(line), '')
+            if event is not None:
+                events.put(event)
+
+
+def _listen(path, events):
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    while True:
+        (conn, _) = server.accept()
+
+        def handle(conn):
+            with conn, conn.makefile() as f:
+                _read_lines(f, events)
+
+        threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+
+# Reads events from `feed` onto the `events` queue, followed by `None` if the feed ends.
+# See `EVENT_FEED` in `zcash-issue-dag.py` for the supported feeds.
+def read_feed(feed, events):
+    try:
+        if feed == '-':
+            _read_lines(sys.stdin, events)
+        elif feed.startswith('unix:'):
+            _listen(feed[len('unix:'):], events)
+        else:
+            _follow(feed, events)
+    finally:
+        events.put(None)
@@ -1,7 +1,7 @@
-from sgqlc.endpoint.http import HTTPEndpoint
-from sgqlc.operation import Operation
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import os
 
-from github_schema import github_schema as schema
+from helpers import graphql, transport
 from helpers.repos import (
     CORE_REPOS,
     HALO2_REPOS,
@@ -15,10 +15,11 @@ from helpers.repos import (
     ZF_FROST_REPOS,
     ZCASHD_DEPRECATION_REPOS,
     POOL_DEPRECATION_REPOS,
-    POOL_DEPRECATION_REPOS,
+    RepoSet,
 )
 
-REPO_SETS = {
+# The repos of each view, as `RepoSet`s so that filtering by repo is cheap.
+REPO_SETS = {name: RepoSet(repos) for (name, repos) in {
     'core': CORE_REPOS,
     'halo2': HALO2_REPOS,
     'tfl': TFL_REPOS,
@@ -33,12 +34,15 @@ REPO_SETS = {
     'zcashd-deprecation': ZCASHD_DEPRECATION_REPOS,
     'sprout-deprecation': POOL_DEPRECATION_REPOS,
     'transparent-deprecation': POOL_DEPRECATION_REPOS,
-}
+}.items()}
+
+
+SCHEMA = 'github_schema.json'
 
 
 def api(token):
-    return HTTPEndpoint(
-        'https://api.github.com/graphql',
+    return transport.Endpoint(
+        os.environ.get('GITHUB_GRAPHQL_URL', 'https://api.github.com/graphql'),
         {'Authorization': 'bearer %s' % token},
     )
 
@@ -47,35 +51,48 @@ class GitHubIssue:
     def __init__(self, repo, issue_number, data, REPOS):
         self.repo = repo
         self.issue_number = issue_number
-        self.milestone = None
         self._REPOS = REPOS
 
+        # If we can't fetch issue data, assume we don't care.
+        self.title = ''
+        self.labels = []
+        self.milestone = None
+        self.url = None
+        self.is_release = False
+        self.is_target = False
+        self.is_pr = False
+        self.is_committed = False
+        self.is_in_progress = False
+        self.waiting_on_review = False
+        self.state = 'closed'
+        self.updated_at = None
+
         if data is not None:
+            self.update(data)
+
+    # Sets whichever fields are present in `data`. This allows an issue to be fetched
+    # in several phases, each of which selects a subset of the fields.
+    def update(self, data):
+        if 'labels' in data:
             labels = [label['name'] for label in data['labels']['nodes']]
-            self.title = data['title']
             self.labels = labels
             self.is_release = 'C-release' in labels
             self.is_target = 'C-target' in labels
-            self.is_pr = 'merged' in data
             self.is_committed = 'S-committed' in labels
             self.is_in_progress = 'S-in-progress' in labels
             self.waiting_on_review = 'S-waiting-on-review' in labels
+        if 'title' in data:
+            self.title = data['title']
+        if 'url' in data:
             self.url = data['url']
+        if 'merged' in data:
+            self.is_pr = True
+        if 'state' in data:
             self.state = 'closed' if data['state'] in ['CLOSED', 'MERGED'] else 'open'
-            if 'milestone' in data and data['milestone']:
-                self.milestone = data['milestone']['title']
-        else:
-            # If we can't fetch issue data, assume we don't care.
-            self.title = ''
-            self.labels = []
-            self.url = None
-            self.is_release = False
-            self.is_target = False
-            self.is_pr = False
-            self.is_committed = False
-            self.is_in_progress = False
-            self.waiting_on_review = False
-            self.state = 'closed'
+        if 'milestone' in data and data['milestone']:
+            self.milestone = data['milestone']['title']
+        if 'updatedAt' in data:
+            self.updated_at = data['updatedAt']
 
     def __repr__(self):
         if self.repo in self._REPOS:
@@ -94,33 +111,166 @@ class GitHubIssue:
         targets_cat = self.is_target if 'targets' in categories else False
         return release_cat or targets_cat
 
+    # Returns the data of this issue in the form returned by GitHub, such that
+    # `GitHubIssue(repo, issue_number, issue.data(), REPOS)` is a copy of it.
+    def data(self):
+        data = {
+            'state': 'CLOSED' if self.state == 'closed' else 'OPEN',
+            'title': self.title,
+            'url': self.url,
+            'milestone': {'title': self.milestone} if self.milestone is not None else None,
+            'updatedAt': self.updated_at,
+            'labels': {'nodes': [{'name': name} for name in self.labels]},
+        }
+        if self.is_pr:
+            # We don't track whether closed PRs were merged; only its presence is read.
+            data['merged'] = None
+        return data
+
+
+# The set of issue and PR fields selected by a query.
+#
+# `labels` is the maximum number of labels to fetch per issue. GitHub does not let us
+# filter an issue's labels by name, so we can't request only the labels we read.
+class Projection:
+    def __init__(self, fields, labels=50):
+        self.fields = frozenset(fields)
+        self.labels = labels
 
-def fetch_issues(op, issues):
-    repos = set([repo for (repo, _) in issues])
-    repos = {repo: [issue for (r, issue) in issues if r == repo] for repo in repos}
+    def __repr__(self):
+        return 'Projection(%s)' % ', '.join(sorted(self.fields))
+
+    def __eq__(self, other):
+        return (self.fields, self.labels) == (other.fields, other.labels)
 
-    for repo, issues in repos.items():
-        conn = op.repository(
-            owner=repo.name[0],
-            name=repo.name[1],
-            __alias__='repo%d' % repo.gh_id,
+    def __hash__(self):
+        return hash((self.fields, self.labels))
+
+    def __contains__(self, field):
+        return field in self.fields
+
+    def __bool__(self):
+        return len(self.fields) > 0
+
+    def __or__(self, other):
+        return Projection(self.fields | other.fields, max(self.labels, other.labels))
+
+
+ALL_FIELDS = Projection(['state', 'labels', 'title', 'url', 'milestone', 'merged'])
+
+
+# Works out the minimal projections needed to render a DAG with the given options.
+#
+# Returns `(state, details)`, where `state` is the projection needed to prune the graph
+# and `details` is the remaining projection needed to render the surviving issues.
+#
+# - `prune_labels`: whether pruning reads C-release / C-target labels (ONLY_INCLUDE, or
+#   PRUNE_FINISHED set to categories).
+# - `show_milestones`: whether milestones are rendered.
+# - `style`: whether issues are rendered with labels, URLs, and PR shapes. If false,
+#   only titles are fetched (e.g. for epic cluster labels).
+def plan_projections(prune_labels=False, show_milestones=False, style=True):
+    state = set(['state'])
+    if prune_labels:
+        state.add('labels')
+
+    details = set(['title'])
+    if style:
+        details |= set(['labels', 'url', 'merged'])
+    if show_milestones:
+        details.add('milestone')
+
+    return (Projection(state), Projection(details - state))
+
+
+def _issue_fields(projection, is_pr):
+    fields = []
+    if 'labels' in projection:
+        fields.append('labels(first: %d) { nodes { name } }' % projection.labels)
+    if 'state' in projection:
+        fields.append('state')
+    if 'milestone' in projection:
+        fields.append('milestone { title }')
+    if 'title' in projection:
+        fields.append('title')
+    if 'url' in projection:
+        fields.append('url')
+    if is_pr and 'merged' in projection:
+        fields.append('merged')
+    if 'updatedAt' in projection:
+        fields.append('updatedAt')
+    return ' '.join(fields)
+
+
+# Returns the `IssueFields` or `PullRequestFields` fragment for the given projection.
+def _fragment(projection, is_pr):
+    key = (projection, is_pr)
+    if key not in _fragment_cache:
+        _fragment_cache[key] = '\nfragment %s on %s { %s }' % (
+            'PullRequestFields' if is_pr else 'IssueFields',
+            'PullRequest' if is_pr else 'Issue',
+            _issue_fields(projection, is_pr),
         )
+    return _fragment_cache[key]
+
+
+_fragment_cache = {}
+
+
+# Builds a query fetching the given `(Repo, issue_number)` tuples, and its variables.
+def fetch_issues(issues, projection=ALL_FIELDS):
+    repos = {}
+    for (repo, issue) in issues:
+        repos.setdefault(repo, []).append(issue)
+
+    params = []
+    selections = []
+    variables = {}
+    for (i, (repo, issues)) in enumerate(repos.items()):
+        params.append('$owner%d: String!, $name%d: String!' % (i, i))
+        variables['owner%d' % i] = repo.name[0]
+        variables['name%d' % i] = repo.name[1]
+        selections.append('repo%d: repository(owner: $owner%d, name: $name%d) { %s }' % (
+            repo.gh_id, i, i,
+            ' '.join(
+                'issue%d: issueOrPullRequest(number: %d) { ...IssueFields ...PullRequestFields }' % (issue, issue)
+                for issue in issues
+            ),
+        ))
+
+    query = 'query(%s) {\n%s\n}%s%s' % (
+        ', '.join(params),
+        '\n'.join(selections),
+        _fragment(projection, False),
+        _fragment(projection, True),
+    )
+    return (query, variables)
 
-        for issue in issues:
-            res = conn.issue_or_pull_request(number=issue, __alias__='issue%d' % issue)
-            for typ in [schema.Issue, schema.PullRequest]:
-                node = res.__as__(typ)
-                node.labels(first=50).nodes().name()
-                node.state()
-                node.milestone().title()
-                node.title()
-                node.url()
-                if typ == schema.PullRequest:
-                    node.merged()
+
+def chunks(lst, n):
+    for i in range(0, len(lst), n):
+        yield lst[i : i + n]
+
+
+# Yields `((repo, issue), issue_data)` for each of the given `(Repo, issue_number)`
+# tuples, fetching the given `projection` in batches.
+def _download(endpoint, issues, projection):
+    for issues in chunks(list(issues), 50):
+        data = graphql.query(endpoint, SCHEMA, *fetch_issues(issues, projection))
+
+        for repo, issue in issues:
+            # If GITHUB_TOKEN doesn't have permission to read from a particular private
+            # repository in REPOS, GitHub returns an empty repo_data section.
+            repo_data = data.get('repo%d' % repo.gh_id) or {}
+            issue_data = repo_data.get('issue%d' % issue)
+            yield ((repo, issue), issue_data)
 
 
 # `nodes` is a list of `(Repo, issue_number)` tuples.
-def download_issues(endpoint, nodes, REPOS):
+#
+# Only the given `projection` is fetched; the remaining fields of each `GitHubIssue`
+# can later be filled in with `download_issue_details`.
+def download_issues(endpoint, nodes, REPOS, projection=ALL_FIELDS):
     issues = [(repo, issue) for (repo, issue) in nodes if repo in REPOS]
 
     ret = {}
@@ -130,115 +280,292 @@ def download_issues(endpoint, nodes, REPOS):
     for repo, issue in [(repo, issue) for (repo, issue) in nodes if repo not in REPOS]:
         ret[(repo, issue)] = GitHubIssue(repo, issue, None, REPOS)
 
-    def chunks(lst, n):
-        for i in range(0, len(lst), n):
-            yield lst[i : i + n]
-
-    for issues in chunks(issues, 50):
-        op = Operation(schema.Query)
-        fetch_issues(op, issues)
-
-        d = endpoint(op)
-        data = op + d
-
-        for repo, issue in issues:
-            repo_data = data['repo%d' % repo.gh_id]
-            issue_key = 'issue%d' % issue
-            # If GITHUB_TOKEN doesn't have permission to read from a particular private
-            # repository in REPOS, GitHub returns an empty repo_data section.
-            issue_data = repo_data[issue_key] if issue_key in repo_data else None
-            ret[(repo, issue)] = GitHubIssue(repo, issue, issue_data, REPOS)
+    for ((repo, issue), issue_data) in _download(endpoint, issues, projection):
+        ret[(repo, issue)] = GitHubIssue(repo, issue, issue_data, REPOS)
 
     return ret
 
 
-def fetch_issues_with_labels(op, labels, repos):
-    for (repo, (issue_cursor, pr_cursor)) in repos:
-        conn = op.repository(
-            owner=repo.name[0],
-            name=repo.name[1],
-            __alias__='repo%d' % repo.gh_id,
-        )
-
-        if issue_cursor != -1:
-            issues = conn.issues(
-                labels=labels,
-                first=50,
-                after=issue_cursor,
-            )
-            issues.nodes.number()
-            issues.nodes.labels(first=50).nodes().name()
-            issues.nodes.state()
-            issues.nodes.milestone().title()
-            issues.nodes.title()
-            issues.nodes.url()
-            issues.page_info.has_next_page()
-            issues.page_info.end_cursor()
-
-        if pr_cursor != -1:
-            prs = conn.pull_requests(
-                labels=labels,
-                first=50,
-                after=pr_cursor,
-            )
-            prs.nodes.number()
-            prs.nodes.labels(first=50).nodes().name()
-            prs.nodes.state()
-            prs.nodes.milestone().title()
-            prs.nodes.title()
-            prs.nodes.url()
-            prs.nodes.merged()
-            prs.page_info.has_next_page()
-            prs.page_info.end_cursor()
-
-
-def download_issues_with_labels(endpoint, labels, REPOS):
-    ret = {}
-    repos = {repo: (None, None) for repo in REPOS}
-
-    while True:
-        op = Operation(schema.Query)
-        fetch_issues_with_labels(op, labels, repos.items())
-
-        d = endpoint(op)
-        data = op + d
-
-        done = []
-        for (repo, (_, _)) in repos.items():
-            repo_data = data['repo%d' % repo.gh_id]
-
-            if hasattr(repo_data, 'issues'):
-                for issue in repo_data.issues.nodes:
-                    ret[(repo, issue.number)] = GitHubIssue(repo, issue.number, issue, REPOS)
-                if repo_data.issues.page_info.has_next_page:
-                    issue_cursor = repo_data.issues.page_info.end_cursor
-                else:
-                    issue_cursor = -1
+# Downloads issues in the background as their `(Repo, issue_number)` tuples are
+# submitted, so that fetching can overlap with e.g. paginating the ZenHub graph.
+#
+# Each issue is fetched at most once. Submitted issues are fetched in batches of 50 as
+# soon as a full batch is available, with up to `CONCURRENCY` batches in flight;
+# `result()` fetches any remainder and returns the same mapping as `download_issues`.
+class IssueFetcher:
+    def __init__(self, endpoint, REPOS, projection=ALL_FIELDS):
+        self._endpoint = endpoint
+        self._REPOS = REPOS
+        self._projection = projection
+        self._seen = set()
+        self._pending = []
+        self._futures = []
+        self._executor = ThreadPoolExecutor(max_workers=CONCURRENCY)
+        self._ret = {}
+
+    def submit(self, nodes):
+        for (repo, issue) in nodes:
+            if (repo, issue) in self._seen:
+                continue
+            self._seen.add((repo, issue))
+            if repo in self._REPOS:
+                self._pending.append((repo, issue))
             else:
-                issue_cursor = -1
-
-            if hasattr(repo_data, 'pull_requests'):
-                for pr in repo_data.pull_requests.nodes:
-                    ret[(repo, pr.number)] = GitHubIssue(repo, pr.number, pr, REPOS)
-                if repo_data.pull_requests.page_info.has_next_page:
-                    pr_cursor = repo_data.pull_requests.page_info.end_cursor
-                else:
-                    pr_cursor = -1
+                self._ret[(repo, issue)] = GitHubIssue(repo, issue, None, self._REPOS)
+
+        while len(self._pending) >= 50:
+            self._flush(self._pending[:50])
+            self._pending = self._pending[50:]
+
+    def _flush(self, issues):
+        self._futures.append(self._executor.submit(
+            lambda: list(_download(self._endpoint, issues, self._projection))))
+
+    def result(self):
+        if self._pending:
+            self._flush(self._pending)
+            self._pending = []
+
+        for future in self._futures:
+            for ((repo, issue), issue_data) in future.result():
+                self._ret[(repo, issue)] = GitHubIssue(repo, issue, issue_data, self._REPOS)
+        self._futures = []
+        self._executor.shutdown()
+
+        return self._ret
+
+
+# Fetches the given `projection` for each of the given `GitHubIssue`s, and updates them
+# in place. Issues from repos outside of the issue's `REPOS` are skipped.
+def download_issue_details(endpoint, issues, projection):
+    issues = {(n.repo, n.issue_number): n for n in issues if n.repo in n._REPOS}
+
+    if not projection:
+        return
+
+    for (key, issue_data) in _download(endpoint, issues.keys(), projection):
+        if issue_data is not None:
+            issues[key].update(issue_data)
+
+
+# Each page of issues or PRs fetched by `download_issues_with_labels`.
+PAGE_SIZE = 50
+
+# The maximum number of nodes that a single batch of streams may request. GitHub limits
+# queries to 500,000 nodes, and charges rate limit points per 100 nodes requested.
+MAX_BATCH_COST = 50000
+
+# The number of batches of streams that may be in flight at once.
+CONCURRENCY = int(os.environ.get('GITHUB_CONCURRENCY', '4'))
+
+
+# The number of nodes that fetching one page of a stream can return.
+def stream_cost(projection):
+    labels = projection.labels if 'labels' in projection else 0
+    return PAGE_SIZE * (1 + labels)
+
+
+# Builds a query fetching the next page of issues or PRs with the given labels for each of
+# the given streams, and its variables.
+#
+# `streams` is a list of `((Repo, kind), cursor)` tuples, where `kind` is either
+# `'issues'` or `'prs'`. If `projection` is empty, only the numbers of the issues and PRs
+# are fetched.
+#
+# If `since` is given, only issues and PRs updated since then are fetched. Issues can be
+# filtered by GitHub, but PRs can only be ordered by when they were last updated, so we
+# also fetch `updatedAt` to know when to stop.
+def fetch_issues_with_labels(labels, streams, projection=ALL_FIELDS, since=None):
+    params = ['$labels: [String!]']
+    variables = {'labels': labels}
+    if since is not None:
+        params.append('$since: DateTime')
+        variables['since'] = since
+
+    repos = {}
+    for ((repo, kind), cursor) in streams:
+        repos.setdefault(repo, []).append((kind, cursor))
+
+    selections = []
+    fragments = set()
+    for (i, (repo, kinds)) in enumerate(repos.items()):
+        params.append('$owner%d: String!, $name%d: String!' % (i, i))
+        variables['owner%d' % i] = repo.name[0]
+        variables['name%d' % i] = repo.name[1]
+
+        connections = []
+        for (kind, cursor) in kinds:
+            params.append('$%s%d: String' % (kind, i))
+            variables['%s%d' % (kind, i)] = cursor
+            if kind == 'issues':
+                if projection:
+                    fragments.add(_fragment(projection, False))
+                connections.append(
+                    'issues(labels: $labels, first: %d, after: $issues%d%s) '
+                    '{ nodes { number%s } pageInfo { hasNextPage endCursor } }' % (
+                        PAGE_SIZE, i,
+                        ', filterBy: {since: $since}' if since is not None else '',
+                        ' ...IssueFields' if projection else '',
+                    )
+                )
             else:
-                pr_cursor = -1
+                if projection:
+                    fragments.add(_fragment(projection, True))
+                connections.append(
+                    'pullRequests(labels: $labels, first: %d, after: $prs%d%s) '
+                    '{ nodes { number%s%s } pageInfo { hasNextPage endCursor } }' % (
+                        PAGE_SIZE, i,
+                        ', orderBy: {field: UPDATED_AT, direction: DESC}' if since is not None else '',
+                        ' updatedAt' if since is not None else '',
+                        ' ...PullRequestFields' if projection else '',
+                    )
+                )
+
+        selections.append('repo%d: repository(owner: $owner%d, name: $name%d) { %s }' % (
+            repo.gh_id, i, i, ' '.join(connections),
+        ))
+
+    query = 'query(%s) {\n%s\n}%s' % (
+        ', '.join(params),
+        '\n'.join(selections),
+        ''.join(sorted(fragments)),
+    )
+    return (query, variables)
+
+
+# Packs the given streams into batches that each cost at most `MAX_BATCH_COST`.
+def _pack(streams, cost):
+    per_batch = max(1, MAX_BATCH_COST // cost)
+    return list(chunks(streams, per_batch))
+
+
+# Fetches one page of each stream in `batch`.
+#
+# Returns `(pages, streams)`, where `pages` is a list of `((Repo, kind), nodes)` tuples,
+# and `streams` are the streams in the batch that have further pages.
+def _fetch_batch(endpoint, labels, batch, projection, since):
+    data = graphql.query(endpoint, SCHEMA, *fetch_issues_with_labels(labels, batch, projection, since))
+
+    pages = []
+    streams = []
+    for ((repo, kind), _) in batch:
+        repo_data = data.get('repo%d' % repo.gh_id) or {}
+        page = repo_data.get('issues' if kind == 'issues' else 'pullRequests')
+        if page is None:
+            continue
+
+        nodes = page['nodes']
+        if since is not None and kind == 'prs':
+            # ISO 8601 timestamps in UTC compare correctly as strings.
+            updated = [node for node in nodes if node['updatedAt'] >= since]
+            finished = len(updated) < len(nodes)
+            nodes = updated
+        else:
+            finished = False
+
+        pages.append(((repo, kind), nodes))
+        if page['pageInfo']['hasNextPage'] and not finished:
+            streams.append(((repo, kind), page['pageInfo']['endCursor']))
+
+    return (pages, streams)
+
+
+# Fetches the issues and PRs in `REPOS` that have any of the given `labels`.
+#
+# Each repo's issues and PRs are paginated as independent streams, so that a repo with
+# many pages doesn't hold up the others. Streams that still have pages are repeatedly
+# packed into cost-bounded batches, up to `CONCURRENCY` of which are in flight at once.
+#
+# The result is in a fixed order (by repo, then issues before PRs, then page), whatever
+# order the batches finish in.
+#
+# If `since` (an ISO 8601 timestamp) is given, only issues and PRs updated since then are
+# fetched. Issues that have since lost all of the labels aren't returned either way, so
+# callers that need to notice them can fetch just the numbers of the issues that have
+# the labels, with an empty `projection`.
+def download_issues_with_labels(endpoint, labels, REPOS, projection=ALL_FIELDS, since=None):
+    pending = [((repo, kind), None) for repo in REPOS for kind in ['issues', 'prs']]
+    # Each stream has at most one page in flight, so its pages arrive in order.
+    pages = {stream: [] for (stream, _) in pending}
+    cost = stream_cost(projection)
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        in_flight = set()
+        while pending or in_flight:
+            # Fill any idle slots with batches of the pending streams.
+            if pending and len(in_flight) < CONCURRENCY:
+                batches = _pack(pending, cost)
+                while batches and len(in_flight) < CONCURRENCY:
+                    in_flight.add(executor.submit(
+                        _fetch_batch, endpoint, labels, batches.pop(0), projection, since))
+                pending = [stream for batch in batches for stream in batch]
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                (done_pages, streams) = future.result()
+                for (stream, nodes) in done_pages:
+                    pages[stream] += nodes
+                pending += streams
+
+            if pending or in_flight:
+                print('.', end='', flush=True)
+
+    print()
+    return {
+        (repo, node['number']): GitHubIssue(repo, node['number'], node, REPOS)
+        for ((repo, _), nodes) in pages.items()
+        for node in nodes
+    }
+
+
+# Builds a query fetching when the most recently updated issue and PR in each of the
+# given repos was last updated, and its variables.
+def fetch_repo_activity(repos):
+    params = []
+    selections = []
+    variables = {}
+    for (i, repo) in enumerate(repos):
+        params.append('$owner%d: String!, $name%d: String!' % (i, i))
+        variables['owner%d' % i] = repo.name[0]
+        variables['name%d' % i] = repo.name[1]
+        selections.append(
+            'repo%d: repository(owner: $owner%d, name: $name%d) { '
+            'issues(first: 1, orderBy: {field: UPDATED_AT, direction: DESC}) { nodes { updatedAt } } '
+            'pullRequests(first: 1, orderBy: {field: UPDATED_AT, direction: DESC}) { nodes { updatedAt } } '
+            '}' % (repo.gh_id, i, i)
+        )
 
-            if issue_cursor == -1 and pr_cursor == -1:
-                done.append(repo)
-            else:
-                repos[repo] = (issue_cursor, pr_cursor)
+    query = 'query(%s) {\n%s\n}' % (', '.join(params), '\n'.join(selections))
+    return (query, variables)
 
-        for repo in done:
-            del repos[repo]
 
-        if len(repos) > 0:
-            print('.', end='', flush=True)
-        else:
-            print()
-            break
+# Returns a dict mapping each of the given repos to the time (as an ISO 8601 string) at
+# which any of its issues or PRs was last updated, or `None` if it has none (or the repo
+# can't be read). This takes a single query.
+def get_repo_activity(endpoint, repos):
+    repos = list(repos)
+    data = graphql.query(endpoint, SCHEMA, *fetch_repo_activity(repos))
 
+    ret = {}
+    for repo in repos:
+        repo_data = data.get('repo%d' % repo.gh_id) or {}
+        updated = [
+            node['updatedAt']
+            for connection in ['issues', 'pullRequests']
+            for node in (repo_data.get(connection) or {}).get('nodes', [])
+        ]
+        ret[repo] = max(updated) if updated else None
     return ret
+
+
+# Returns a query of each shape that this module sends, selecting every field that any
+# projection can select. Used to prune the generated schema.
+def all_queries():
+    repo = CORE_REPOS[0]
+    return [
+        fetch_issues([(repo, 1)], ALL_FIELDS | Projection(['updatedAt']))[0],
+        fetch_issues_with_labels([], [((repo, 'issues'), None), ((repo, 'prs'), None)])[0],
+        fetch_issues_with_labels(
+            [], [((repo, 'issues'), None), ((repo, 'prs'), None)], since='1970-01-01T00:00:00Z')[0],
+        fetch_repo_activity([repo])[0],
+    ]
@@ -0,0 +1,59 @@
+import json
+import os
+
+from str2bool import str2bool as strtobool
+
+# Whether to validate every query against the introspected schema before sending it.
+# This is intended for use while developing queries; it requires the schema JSON files
+# generated by `./gen-schema.sh`, and uses the `graphql-core` library that `sgqlc`
+# depends on.
+VALIDATE = strtobool(os.environ.get('GRAPHQL_VALIDATE', 'false'))
+
+_schemas = {}
+_validated = set()
+
+
+# The validation rules we check queries against.
+#
+# We select e.g. `state` in both the `Issue` and `PullRequest` fragments of a single
+# `issueOrPullRequest` field. The two have different enum types, which the spec's
+# "overlapping fields can be merged" rule rejects, but GitHub accepts it.
+def rules():
+    from graphql import OverlappingFieldsCanBeMergedRule, specified_rules
+
+    return [rule for rule in specified_rules if rule is not OverlappingFieldsCanBeMergedRule]
+
+
+def validate(schema_path, query):
+    from graphql import build_client_schema, parse, validate as validate_query
+
+    if schema_path not in _schemas:
+        with open(schema_path) as f:
+            introspection = json.load(f)
+        _schemas[schema_path] = build_client_schema(introspection.get('data', introspection))
+
+    errors = validate_query(_schemas[schema_path], parse(query), rules())
+    if errors:
+        raise ValueError('Invalid query for %s:\n%s\n%s' % (
+            schema_path,
+            '\n'.join(str(e) for e in errors),
+            query,
+        ))
+
+
+# Sends `query` with the given `variables` to `endpoint`, and returns the `data` section
+# of the response as plain dicts and lists.
+#
+# GitHub returns partial data alongside errors (e.g. for private repositories that the
+# token can't read), so errors are only fatal if no data was returned.
+def query(endpoint, schema_path, query, variables=None):
+    if VALIDATE and query not in _validated:
+        validate(schema_path, query)
+        _validated.add(query)
+
+    d = endpoint(query, variables)
+
+    data = d.get('data')
+    if data is None:
+        raise RuntimeError('GraphQL query failed: %s' % d.get('errors'))
+    return data
@@ -0,0 +1,161 @@
+import json
+import os
+import sqlite3
+import zlib
+
+from helpers import store
+
+# If set, the path to an append-only history of the data store, to which
+# `./sync-store.py` adds the data of each sync.
+HISTORY_STORE = os.environ.get('HISTORY_STORE') or None
+
+# If set (along with HISTORY_STORE), scripts read the data as it was at this UTC time,
+# instead of reading the data store or the remote APIs.
+#
+# Format is YYYY-MM-DDTHH:MM:SSZ, or a prefix of one (e.g. YYYY-MM-DD for the start of
+# that day).
+HISTORY_AT = os.environ.get('HISTORY_AT') or None
+
+# A full copy of the data is written once the deltas since the last one add up to this
+# fraction of its size. This bounds both the size of the history (which grows with the
+# amount of change, rather than the number of syncs) and the number of deltas that are
+# applied to reconstruct the data at any time.
+HISTORY_CHECKPOINT_RATIO = float(os.environ.get('HISTORY_CHECKPOINT_RATIO', '1'))
+
+# Each entry is the data at `version` (the time of a sync), stored either in full (a
+# checkpoint) or as a delta from the previous entry, as zlib-compressed JSON. A checkpoint
+# is the dict returned by `Store.records`; a delta is `{"set": {KEY: VALUE}, "del": [KEY]}`.
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS history (
+    version TEXT PRIMARY KEY,
+    checkpoint INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+'''
+
+
+def _encode(value):
+    return zlib.compress(json.dumps(value, separators=(',', ':'), sort_keys=True).encode())
+
+
+def _decode(data):
+    return json.loads(zlib.decompress(data))
+
+
+class History:
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def __repr__(self):
+        return 'History(%s)' % self.path
+
+    def close(self):
+        self.db.close()
+
+    # Returns the versions in the history, oldest first.
+    def versions(self):
+        return [version for (version,) in self.db.execute('SELECT version FROM history ORDER BY version')]
+
+    # Returns the version and records of the latest entry at or before `at` (or of the
+    # latest entry, if `at` is `None`), or `(None, None)` if there is none.
+    def at(self, at=None):
+        if at is None:
+            (at,) = self.db.execute('SELECT MAX(version) FROM history').fetchone()
+            if at is None:
+                return (None, None)
+        row = self.db.execute(
+            'SELECT MAX(version) FROM history WHERE checkpoint AND version <= ?',
+            (at,),
+        ).fetchone()
+        if row[0] is None:
+            return (None, None)
+
+        version = None
+        records = None
+        for (version, checkpoint, data) in self.db.execute(
+            'SELECT version, checkpoint, data FROM history WHERE version >= ? AND version <= ? '
+            'ORDER BY version',
+            (row[0], at),
+        ):
+            value = _decode(data)
+            if checkpoint:
+                records = value
+            else:
+                records.update(value['set'])
+                for key in value['del']:
+                    del records[key]
+        return (version, records)
+
+    # Adds `records` (as returned by `Store.records`) as the data at `version`, which must
+    # be later than every version in the history. Nothing is added if the data hasn't
+    # changed since the latest entry.
+    def record(self, version, records):
+        (latest, old) = self.at()
+        if latest is not None and version <= latest:
+            raise ValueError('History already has data version %s, which is not before %s' % (latest, version))
+
+        if old is None:
+            data = _encode(records)
+            checkpoint = True
+        else:
+            delta = {
+                'set': {key: value for (key, value) in records.items() if old.get(key) != value},
+                'del': sorted(key for key in old if key not in records),
+            }
+            if not delta['set'] and not delta['del']:
+                print('No changes to add to the history')
+                return
+
+            data = _encode(delta)
+            (since, size) = self.db.execute(
+                'SELECT version, length(data) FROM history WHERE checkpoint ORDER BY version DESC LIMIT 1',
+            ).fetchone()
+            (deltas,) = self.db.execute(
+                'SELECT COALESCE(SUM(length(data)), 0) FROM history WHERE version > ?',
+                (since,),
+            ).fetchone()
+            checkpoint = deltas + len(data) > HISTORY_CHECKPOINT_RATIO * size
+            if checkpoint:
+                data = _encode(records)
+
+        with self.db:
+            self.db.execute('INSERT INTO history VALUES (?, ?, ?)', (version, int(checkpoint), data))
+        print('Added %s of data version %s to the history (%d bytes)' % (
+            'a checkpoint' if checkpoint else 'a delta', version, len(data)))
+
+    # Returns an in-memory `Store` with the data as of `at`, or `None` if the history
+    # starts after then.
+    def open_at(self, at):
+        (version, records) = self.at(at)
+        if version is None:
+            return None
+        print('Reading data version %s from the history' % version)
+        db = store.Store(':memory:')
+        db.put_records(records, version)
+        return db
+
+
+# Returns the path to write the output at `path` to. Outputs rendered from the history are
+# written next to those rendered from the current data, with HISTORY_AT added to their
+# names (e.g. `public/zcash-core-dag-at-2024-01-01.svg`), so that they don't replace them.
+def output_path(path):
+    if HISTORY_AT is None:
+        return path
+    (root, ext) = os.path.splitext(path)
+    return '%s-at-%s%s' % (root, HISTORY_AT.replace(':', ''), ext)
+
+
+# Returns the data source to read from: the data as of HISTORY_AT if set, and otherwise
+# the store at DATA_STORE or the remote APIs.
+def open_source(github_token, zenhub_token):
+    if HISTORY_AT is None:
+        return store.open_source(github_token, zenhub_token)
+
+    history = History(HISTORY_STORE)
+    db = history.open_at(HISTORY_AT)
+    history.close()
+    if db is None:
+        raise ValueError('The history at HISTORY_STORE starts after HISTORY_AT=%s' % HISTORY_AT)
+    return db
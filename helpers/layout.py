@@ -0,0 +1,340 @@
+import json
+import multiprocessing
+import os
+
+# Lays out pygraphviz graphs with `dot`, optionally reusing the positions from a previous
+# layout of the same view so that small changes to the graph only move the parts of the
+# drawing that they touch.
+#
+# The state of a layout is a JSON-serializable dict:
+#
+# - `nodes`: maps each node to `[x, y, width, height, signature]`, in points, where the
+#   signature is the node's label and shape (which determine its size).
+# - `edges`: a list of `[source, sink, pos]`, where `pos` is the edge's spline.
+# - `clusters`: maps each cluster subgraph to `[label, nodes, bb]`, where `bb` is its
+#   bounding box (once laid out).
+
+# The `dot` attributes that trade the quality of a large graph's layout for speed: fewer
+# network simplex and crossing minimization iterations, and a smaller search for the edge
+# to exchange in each network simplex iteration.
+FAST_DOT_ATTRS = {
+    'nslimit': '2',
+    'nslimit1': '2',
+    'mclimit': '0.5',
+    'searchsize': '10',
+}
+
+# The gap in points between a component that we move and the rest of the drawing.
+GAP = 36
+
+# The padding in points around the nodes of a cluster, and the height of its label.
+CLUSTER_MARGIN = 8
+CLUSTER_LABEL_HEIGHT = 20
+
+
+def load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        print('Ignoring unreadable layout state %s' % path)
+        return None
+
+
+def save_state(path, state):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _signature(node):
+    return '%s|%s' % (node.attr['label'], node.attr['shape'])
+
+
+def _point(s):
+    (x, y) = s.split(',')[:2]
+    return (float(x), float(y))
+
+
+# Translates a `pos` attribute (a point, or an edge's spline) by `(dx, dy)`.
+def _translate(pos, dx, dy):
+    points = []
+    for token in pos.split():
+        parts = token.split(',')
+        prefix = parts[:-2]
+        (x, y) = (float(parts[-2]), float(parts[-1]))
+        points.append(','.join(prefix + ['%.3f' % (x + dx), '%.3f' % (y + dy)]))
+    return ' '.join(points)
+
+
+def _box(x, y, w, h):
+    return (x - w / 2, y - h / 2, x + w / 2, y + h / 2)
+
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _bounds(boxes):
+    boxes = list(boxes)
+    return (
+        min(b[0] for b in boxes),
+        min(b[1] for b in boxes),
+        max(b[2] for b in boxes),
+        max(b[3] for b in boxes),
+    )
+
+
+# Parses a `bb` attribute. `dot` separates its coordinates with commas, but other engines
+# (such as `sfdp`) may separate them with spaces.
+def _bb(s):
+    return [float(x) for x in s.replace(',', ' ').split()]
+
+
+def _clusters(ag):
+    return {
+        sub.name: [
+            sub.graph_attr['label'] or '',
+            sorted(str(n) for n in sub.nodes()),
+            _bb(sub.graph_attr['bb']) if sub.graph_attr.get('bb') else None,
+        ]
+        for sub in ag.subgraphs()
+        if sub.name.startswith('cluster')
+    }
+
+
+# Returns the state of the laid-out graph `ag`.
+def state_of(ag):
+    return {
+        'nodes': {
+            str(n): list(_point(n.attr['pos'])) + [
+                float(n.attr['width']) * 72,
+                float(n.attr['height']) * 72,
+                _signature(n),
+            ]
+            for n in ag.nodes()
+        },
+        'edges': [[str(e[0]), str(e[1]), e.attr['pos']] for e in ag.edges()],
+        'clusters': _clusters(ag),
+    }
+
+
+# How to lay out a graph (or a part of one, when reusing a previous layout).
+#
+# - If the graph has more than `large_graph` nodes and edges in total, `FAST_DOT_ATTRS`
+#   are applied to it.
+# - If `timeout` is set, the layout runs in a forked subprocess, which is killed if it
+#   takes longer than `timeout` seconds. The graph is then laid out with the `fallback`
+#   engine (such as `sfdp`) instead, in this process and without a time limit, so that
+#   there is always some output. Where processes can't be forked, the layout runs in this
+#   process without a time limit.
+class Policy:
+    def __init__(self, large_graph=None, timeout=None, fallback=None):
+        self.large_graph = large_graph
+        self.timeout = timeout
+        self.fallback = fallback
+
+    # Lays out `ag` with `prog`. Returns the SVG, and the state of the layout.
+    def run(self, ag, prog='dot'):
+        size = ag.number_of_nodes() + ag.number_of_edges()
+        if prog == 'dot' and self.large_graph is not None and size > self.large_graph:
+            print('Laying out %d nodes and edges with faster dot settings' % size)
+            ag.graph_attr.update(FAST_DOT_ATTRS)
+
+        if not self.timeout or 'fork' not in multiprocessing.get_all_start_methods():
+            return _layout(ag, prog)
+
+        try:
+            return _run(ag, prog, self.timeout)
+        except TimeoutError:
+            if not self.fallback:
+                raise
+            print('Layout took longer than %gs; falling back to %s' % (self.timeout, self.fallback))
+        return _layout(ag, self.fallback)
+
+
+def _layout(ag, prog):
+    ag.layout(prog=prog)
+    return (ag.draw(format='svg').decode(), state_of(ag))
+
+
+def _send_layout(ag, prog, conn):
+    conn.send(_layout(ag, prog))
+    conn.close()
+
+
+# Lays out `ag` with the `prog` engine in a forked subprocess, which shares the graph
+# with this process. Raises `TimeoutError` if it takes longer than `timeout` seconds.
+def _run(ag, prog, timeout):
+    context = multiprocessing.get_context('fork')
+    (receiver, sender) = context.Pipe(duplex=False)
+    process = context.Process(target=_send_layout, args=(ag, prog, sender))
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            raise TimeoutError('%s layout took longer than %gs' % (prog, timeout))
+        try:
+            return receiver.recv()
+        except EOFError:
+            raise RuntimeError('%s layout failed' % prog)
+    finally:
+        receiver.close()
+        process.terminate()
+        process.join()
+
+
+# Lays out `ag` from scratch according to `policy` (by default, with `dot` in this
+# process). Returns the SVG, and the state of the layout.
+def full(ag, policy=None):
+    return (policy or Policy()).run(ag)
+
+
+# Returns the connected components of `ag`, ignoring edge directions, as lists of nodes.
+def _components(ag):
+    parent = {str(n): str(n) for n in ag.nodes()}
+
+    def find(n):
+        while parent[n] != n:
+            parent[n] = parent[parent[n]]
+            n = parent[n]
+        return n
+
+    for (u, v) in ag.edges():
+        parent[find(str(u))] = find(str(v))
+
+    components = {}
+    for n in parent:
+        components.setdefault(find(n), []).append(n)
+    return list(components.values())
+
+
+# Lays out the subgraph of `ag` induced by `nodes` on its own with `policy`.
+def _layout_component(ag, nodes, policy):
+    members = set(nodes)
+    sub = ag.__class__(directed=ag.directed, strict=ag.strict)
+    sub.graph_attr.update(ag.graph_attr)
+    for n in nodes:
+        sub.add_node(n, **ag.get_node(n).attr)
+    for e in ag.edges():
+        (u, v) = (str(e[0]), str(e[1]))
+        if u in members and v in members:
+            sub.add_edge(u, v, **e.attr)
+    for cluster in ag.subgraphs():
+        inside = [str(n) for n in cluster.nodes() if str(n) in members]
+        if inside:
+            sub.add_subgraph(inside, cluster.name, **cluster.graph_attr)
+    return policy.run(sub)[1]
+
+
+# Lays out `ag`, reusing the positions in `previous` (the state of an earlier layout of
+# the same view) where possible. Returns the SVG, and the state of the new layout.
+#
+# Nodes whose signatures, edges and clusters are unchanged keep their positions. Each
+# connected component containing a change is laid out again on its own, and placed where
+# its unchanged nodes were (or below the rest of the drawing, if that would overlap
+# another component or it is new). Edges are routed again only within those components.
+#
+# Every layout (including routing the edges at the end) follows `policy`. Falls back to a
+# full layout if there is no previous layout, if more than `threshold` (as a fraction of
+# the nodes) changed, or if a cluster would overlap other nodes.
+def stable(ag, previous, threshold, policy=None):
+    policy = policy or Policy()
+    if previous is None:
+        return full(ag, policy)
+
+    nodes = {str(n): _signature(n) for n in ag.nodes()}
+    old_nodes = previous['nodes']
+    old_edges = {(u, v): pos for (u, v, pos) in previous['edges']}
+    edges = set((str(u), str(v)) for (u, v) in ag.edges())
+    clusters = _clusters(ag)
+
+    changed = set(n for (n, sig) in nodes.items() if n not in old_nodes or old_nodes[n][4] != sig)
+    for (u, v) in edges.symmetric_difference(old_edges):
+        changed.update(n for n in (u, v) if n in nodes)
+    for name in set(clusters) | set(previous['clusters']):
+        members = set(clusters.get(name, ['', [], None])[1])
+        old_members = set(previous['clusters'].get(name, ['', [], None])[1])
+        changed.update(n for n in members.symmetric_difference(old_members) if n in nodes)
+    removed = set(old_nodes) - set(nodes)
+
+    if len(changed) + len(removed) > threshold * max(len(nodes), 1):
+        print('Layout changed too much to reuse')
+        return full(ag, policy)
+
+    # Place the components that changed, keeping the others where they were.
+    relaid = [c for c in _components(ag) if changed.intersection(c)]
+    fixed = set(nodes) - set(n for c in relaid for n in c)
+    placed = {n: old_nodes[n][:4] for n in fixed}
+    edge_pos = {(u, v): old_edges[u, v] for (u, v) in edges if u in fixed and v in fixed}
+
+    boxes = [_box(*geometry) for geometry in placed.values()]
+    floor = _bounds(boxes)[1] if boxes else 0
+    left = _bounds(boxes)[0] if boxes else 0
+    for component in relaid:
+        state = _layout_component(ag, component, policy)
+        new = state['nodes']
+
+        # Anchor the component on its unchanged nodes (or failing that, on the nodes that
+        # were in the previous layout at all).
+        anchors = [n for n in component if n in old_nodes and n not in changed] or [
+            n for n in component if n in old_nodes
+        ]
+        if anchors:
+            dx = sum(old_nodes[n][0] - new[n][0] for n in anchors) / len(anchors)
+            dy = sum(old_nodes[n][1] - new[n][1] for n in anchors) / len(anchors)
+            component_boxes = [_box(x + dx, y + dy, w, h) for (x, y, w, h, _) in new.values()]
+        if not anchors or any(_overlaps(a, b) for a in component_boxes for b in boxes):
+            # Move it below the rest of the drawing.
+            (x0, _, _, y1) = _bounds(_box(*geometry[:4]) for geometry in new.values())
+            (dx, dy) = (left - x0, floor - GAP - y1)
+            component_boxes = [_box(x + dx, y + dy, w, h) for (x, y, w, h, _) in new.values()]
+
+        for (n, (x, y, w, h, _)) in new.items():
+            placed[n] = [x + dx, y + dy, w, h]
+        for (u, v, pos) in state['edges']:
+            edge_pos[u, v] = _translate(pos, dx, dy)
+        boxes += component_boxes
+        floor = min(floor, _bounds(component_boxes)[1])
+
+    # Keep the clusters that only contain unchanged nodes, and fit the others around their
+    # nodes. Give up if that would cover any other node or cluster.
+    cluster_boxes = {
+        name: tuple(previous['clusters'][name][2])
+        for (name, (_, members, _)) in clusters.items()
+        if name in previous['clusters'] and fixed.issuperset(members)
+    }
+    for (name, (label, members, _)) in clusters.items():
+        if name in cluster_boxes:
+            continue
+        (x0, y0, x1, y1) = _bounds(_box(*placed[n]) for n in members)
+        box = (
+            x0 - CLUSTER_MARGIN,
+            y0 - CLUSTER_MARGIN,
+            x1 + CLUSTER_MARGIN,
+            y1 + CLUSTER_MARGIN + CLUSTER_LABEL_HEIGHT,
+        )
+        inside = set(members)
+        if any(_overlaps(box, _box(*placed[n])) for n in nodes if n not in inside) or any(
+            _overlaps(box, other) for other in cluster_boxes.values()
+        ):
+            print('Layout clusters would overlap; laying out again')
+            return full(ag, policy)
+        cluster_boxes[name] = box
+
+    for (n, (x, y, _, _)) in placed.items():
+        ag.get_node(n).attr['pos'] = '%.3f,%.3f' % (x, y)
+    for e in ag.edges():
+        pos = edge_pos.get((str(e[0]), str(e[1])))
+        if pos is not None:
+            e.attr['pos'] = pos
+    for sub in ag.subgraphs():
+        if sub.name in cluster_boxes:
+            sub.graph_attr['bb'] = '%.3f,%.3f,%.3f,%.3f' % cluster_boxes[sub.name]
+
+    # Route any edges without splines, and normalize the coordinates.
+    return policy.run(ag, 'nop2')
@@ -0,0 +1,201 @@
+import cProfile
+from datetime import datetime, timezone
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+from str2bool import str2bool as strtobool
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
+
+# If set, a directory in which each run of a script writes a JSON report of its
+# performance, named `SCRIPT-TIMESTAMP.json`. The report covers the wall time and peak
+# RSS of each stage, the requests made to each GraphQL endpoint, and the size of the
+# graph after each filter.
+PROFILE_DIR = os.environ.get('PROFILE_DIR') or None
+
+# Whether to also write a cProfile dump of each stage to PROFILE_DIR, named
+# `SCRIPT-TIMESTAMP-STAGE.prof`, for use with `pstats` or `snakeviz`.
+PROFILE_CPROFILE = strtobool(os.environ.get('PROFILE_CPROFILE', 'false'))
+
+# Whether to also trace Python memory allocations, and report the peak allocated by each
+# stage. This slows the run down a lot, so the wall times are less meaningful with it.
+PROFILE_MEMORY = strtobool(os.environ.get('PROFILE_MEMORY', 'false'))
+
+# The upper bounds in milliseconds of the buckets of the request latency histograms.
+LATENCY_BUCKETS = [50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# The response headers in which GitHub (and possibly ZenHub) report rate limit usage.
+RATE_LIMIT_HEADERS = ['X-RateLimit-Limit', 'X-RateLimit-Remaining', 'X-RateLimit-Used']
+
+_lock = threading.Lock()
+_run = None
+
+
+def enabled():
+    return _run is not None
+
+
+# Starts recording a run of `script`. Does nothing unless PROFILE_DIR is set.
+def start(script):
+    global _run
+    if PROFILE_DIR is None:
+        return
+
+    if PROFILE_MEMORY:
+        tracemalloc.start()
+    _run = {
+        'script': script,
+        'started_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'start': time.perf_counter(),
+        'stages': [],
+        'endpoints': {},
+        'graphs': [],
+        'stage': None,
+    }
+
+
+# Ends the current stage (if any), and starts a stage called `name`. Stages run one after
+# another, so the pipeline only needs to mark where each one begins.
+def stage(name, **tags):
+    if _run is None:
+        return
+    _end_stage()
+
+    if PROFILE_MEMORY and hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    profiler = None
+    if PROFILE_CPROFILE:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler = cProfile.Profile()
+        profiler.enable()
+    _run['stage'] = (name, tags, time.perf_counter(), profiler)
+
+
+def _end_stage():
+    if _run['stage'] is None:
+        return
+    (name, tags, started, profiler) = _run['stage']
+    _run['stage'] = None
+
+    seconds = time.perf_counter() - started
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(_path('-%s.prof' % name.replace(' ', '-')))
+
+    entry = dict(tags)
+    entry.update({
+        'stage': name,
+        'seconds': round(seconds, 6),
+    })
+    if resource is not None:
+        # The peak of the process so far, in kilobytes on Linux and bytes on macOS.
+        entry['max_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if PROFILE_MEMORY:
+        # Without `tracemalloc.reset_peak` (before Python 3.9), this is the peak so far.
+        entry['peak_python_bytes'] = tracemalloc.get_traced_memory()[1]
+    _run['stages'].append(entry)
+
+
+# Records the size of the graph `dg` at the point labelled `label` (e.g. after a filter).
+def graph(label, dg, **tags):
+    if _run is None:
+        return
+    entry = dict(tags)
+    entry.update({
+        'graph': label,
+        'stage': _run['stage'][0] if _run['stage'] else None,
+        'nodes': dg.number_of_nodes(),
+        'edges': dg.number_of_edges(),
+    })
+    _run['graphs'].append(entry)
+
+
+# Records a request to the endpoint at `url`. Called from any thread.
+def request(url, seconds, sent, received, status, headers):
+    if _run is None:
+        return
+
+    ms = seconds * 1000
+    with _lock:
+        endpoint = _run['endpoints'].setdefault(url, {
+            'requests': 0,
+            'errors': 0,
+            'bytes_sent': 0,
+            'bytes_received': 0,
+            'seconds': 0.0,
+            'max_latency_ms': 0.0,
+            'latency_ms': dict(
+                [('<=%d' % b, 0) for b in LATENCY_BUCKETS] + [('>%d' % LATENCY_BUCKETS[-1], 0)]),
+            'rate_limit': {},
+        })
+
+        endpoint['requests'] += 1
+        if status >= 400:
+            endpoint['errors'] += 1
+        endpoint['bytes_sent'] += sent
+        endpoint['bytes_received'] += received
+        endpoint['seconds'] += seconds
+        endpoint['max_latency_ms'] = max(endpoint['max_latency_ms'], round(ms, 3))
+
+        bucket = next(('<=%d' % b for b in LATENCY_BUCKETS if ms <= b), '>%d' % LATENCY_BUCKETS[-1])
+        endpoint['latency_ms'][bucket] += 1
+
+        # The GraphQL cost of the run is the increase in the rate limit points used, plus
+        # the cost of the first request (which the headers can't tell us).
+        rate_limit = endpoint['rate_limit']
+        for header in RATE_LIMIT_HEADERS:
+            value = headers.get(header) if headers is not None else None
+            if value is not None and value.isdigit():
+                key = header[len('X-RateLimit-'):].lower()
+                rate_limit.setdefault('first_%s' % key, int(value))
+                rate_limit['last_%s' % key] = int(value)
+        if 'first_used' in rate_limit:
+            rate_limit['cost_after_first_request'] = rate_limit['last_used'] - rate_limit['first_used']
+
+
+def _path(suffix):
+    return os.path.join(PROFILE_DIR, '%s-%s%s' % (
+        _run['script'],
+        _run['started_at'].replace(':', ''),
+        suffix,
+    ))
+
+
+# Ends the run, and writes its report.
+def finish():
+    global _run
+    if _run is None:
+        return
+    _end_stage()
+    for endpoint in _run['endpoints'].values():
+        endpoint['seconds'] = round(endpoint['seconds'], 6)
+
+    report = {
+        'script': _run['script'],
+        'started_at': _run['started_at'],
+        'seconds': round(time.perf_counter() - _run['start'], 6),
+        'stages': _run['stages'],
+        'endpoints': _run['endpoints'],
+        'graphs': _run['graphs'],
+    }
+    if resource is not None:
+        # Kilobytes on Linux, and bytes on macOS.
+        report['max_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if PROFILE_MEMORY:
+        report['peak_python_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = _path('.json')
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+    print('Wrote performance report to %s' % path)
+    _run = None
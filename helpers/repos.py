@@ -21,15 +21,56 @@ class Repo(object):
         return hash(self.gh_id)
 
 
+# A set of repos, indexed by name and by GitHub ID. Iterating over it preserves the
+# order in which the repos were given, without duplicates.
+class RepoSet(frozenset):
+    def __new__(cls, repos):
+        repos = list(dict.fromkeys(repos))
+        ret = super().__new__(cls, repos)
+        ret.ordered = repos
+        ret.by_name = {repo.name: repo for repo in repos}
+        ret.by_gh_id = {repo.gh_id: repo for repo in repos}
+        return ret
+
+    def __iter__(self):
+        return iter(self.ordered)
+
+    def __repr__(self):
+        return 'RepoSet(%r)' % self.ordered
+
+    def __reduce__(self):
+        return (RepoSet, (self.ordered,))
+
+
+# Returns the given lists of repos concatenated, without duplicates.
+def merge(*repo_lists):
+    return list(dict.fromkeys(repo for repos in repo_lists for repo in repos))
+
+
+# Each repo is defined once, so that every list containing it shares the same object (and
+# learns its ZenHub ID once `helpers.zenhub` discovers it).
+#
 # To get the GitHub ID of a repo, see <https://stackoverflow.com/a/47223479/393146>.
+# The ZenHub IDs of repos in ZenHub workspaces are printed by `zenhub-repo-ids.py`. Repos
+# without a ZenHub ID here have theirs discovered and cached at `ZENHUB_ID_CACHE`.
 
+ZCASH = Repo(('zcash', 'zcash'), 26987049, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvOTc3ODc2NQ')
+ZIPS = Repo(('zcash', 'zips'), 47279130, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMjIwMzQwMDY')
+INCREMENTALMERKLETREE = Repo(('zcash', 'incrementalmerkletree'), 48303644, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMzMDcwMDc5')
 ZIP32 = Repo(('zcash', 'zip32'), 141066493, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMzOTY2MzAy')
 LIBRUSTZCASH = Repo(('zcash', 'librustzcash'), 85334928, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTg5MDU1NTE')
+ZCASH_TEST_VECTORS = Repo(('zcash', 'zcash-test-vectors'), 133857578, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMyOTMxNTEx')
+SAPLING_CRYPTO = Repo(('zcash', 'sapling-crypto'), 111058300, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMzOTY3ODY4')
+ORCHARD = Repo(('zcash', 'orchard'), 305835578, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMyODU2MzA2')
+WALLET = Repo(('zcash', 'wallet'), 863610221, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTM0MzU3MjQ0')
+LIGHTWALLETD = Repo(('zcash', 'lightwalletd'), 159714694, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTg5MDU1NzE')
 ZCASH_ANDROID_WALLET_SDK = Repo(('Electric-Coin-Company', 'zcash-android-wallet-sdk'), 151763639, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTg5MDI4MjE')
 ZCASH_LIGHT_CLIENT_FFI = Repo(('Electric-Coin-Company', 'zcash-light-client-ffi'), 439137887, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMzMTMwNjcy')
 ZCASH_SWIFT_WALLET_SDK = Repo(('Electric-Coin-Company', 'zcash-swift-wallet-sdk'), 185480114, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTg5MDU1NjE')
 ZASHI_ANDROID = Repo(('Electric-Coin-Company', 'zashi-android'), 390808594, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMzMDEwMTMw')
 ZASHI_IOS = Repo(('Electric-Coin-Company', 'zashi-ios'), 387551125, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMzMDEwMTI5')
+ZASHI = Repo(('Electric-Coin-Company', 'zashi'), 719178328, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMzOTYwOTgw')
+ZCASH_SCRIPT = Repo(('ZcashFoundation', 'zcash_script'), 279422254, None)
 
 HALO2_REPOS = [
     Repo(('zcash', 'halo2'), 290019239, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMyNzg1NDUx'),
@@ -37,14 +78,14 @@ HALO2_REPOS = [
 ]
 
 CORE_REPOS = [
-    Repo(('zcash', 'zcash'), 26987049, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvOTc3ODc2NQ'),
-    Repo(('zcash', 'zips'), 47279130, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMjIwMzQwMDY'),
-    Repo(('zcash', 'incrementalmerkletree'), 48303644, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMzMDcwMDc5'),
+    ZCASH,
+    ZIPS,
+    INCREMENTALMERKLETREE,
     LIBRUSTZCASH,
-    Repo(('zcash', 'zcash-test-vectors'), 133857578, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMyOTMxNTEx'),
-    Repo(('zcash', 'sapling-crypto'), 111058300, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMzOTY3ODY4'),
-    Repo(('zcash', 'orchard'), 305835578, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMyODU2MzA2'),
-    Repo(('zcash', 'wallet'), 863610221, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTM0MzU3MjQ0'),
+    ZCASH_TEST_VECTORS,
+    SAPLING_CRYPTO,
+    ORCHARD,
+    WALLET,
     ZIP32,
 ] + HALO2_REPOS
 
@@ -57,7 +98,7 @@ TFL_REPOS = [
 ANDROID_REPOS = [
     ZASHI_ANDROID,
     ZCASH_ANDROID_WALLET_SDK,
-    Repo(('Electric-Coin-Company', 'zashi'), 719178328, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMzOTYwOTgw'),
+    ZASHI,
 ]
 
 IOS_REPOS = [
@@ -65,23 +106,23 @@ IOS_REPOS = [
     ZCASH_SWIFT_WALLET_SDK,
     Repo(('Electric-Coin-Company', 'MnemonicSwift'), 270825987, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMyNzk3Mzg0'),
     ZCASH_LIGHT_CLIENT_FFI,
-    Repo(('Electric-Coin-Company', 'zashi'), 719178328, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMzOTYwOTgw'),
+    ZASHI,
 ]
 
-WALLET_REPOS = [
+WALLET_REPOS = merge([
     LIBRUSTZCASH,
-    Repo(('zcash', 'lightwalletd'), 159714694, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTg5MDU1NzE'),
-] + ANDROID_REPOS + IOS_REPOS
+    LIGHTWALLETD,
+], ANDROID_REPOS, IOS_REPOS)
 
-ECC_REPOS = CORE_REPOS + TFL_REPOS + WALLET_REPOS + [
+ECC_REPOS = merge(CORE_REPOS, TFL_REPOS, WALLET_REPOS, [
     Repo(('Electric-Coin-Company', 'infrastructure'), 65419597, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMjIwNTA1NjY'),
-]
+])
 
 ZF_REPOS = [
     Repo(('ZcashFoundation', 'zebra'), 205255683, None),
     Repo(('ZcashFoundation', 'redjubjub'), 225479018, None),
     Repo(('ZcashFoundation', 'ed25519-zebra'), 235651437, None),
-    Repo(('ZcashFoundation', 'zcash_script'), 279422254, None),
+    ZCASH_SCRIPT,
 ]
 
 ZF_FROST_REPOS = [
@@ -89,26 +130,27 @@ ZF_FROST_REPOS = [
 ]
 
 ZCASHD_DEPRECATION_REPOS = [
-    Repo(('zcash', 'zcash'), 26987049, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvOTc3ODc2NQ'),
-    Repo(('zcash', 'zips'), 47279130, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMjIwMzQwMDY'),
+    ZCASH,
+    ZIPS,
     LIBRUSTZCASH,
-    Repo(('zcash', 'wallet'), 863610221, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTM0MzU3MjQ0'),
-    Repo(('zcash', 'lightwalletd'), 159714694, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTg5MDU1NzE'),
-    Repo(('ZcashFoundation', 'zcash_script'), 279422254, None),
+    WALLET,
+    LIGHTWALLETD,
+    ZCASH_SCRIPT,
 ]
 
 ZALLET_REPOS = [
-    Repo(('zcash', 'zips'), 47279130, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMjIwMzQwMDY'),
-    Repo(('zcash', 'incrementalmerkletree'), 48303644, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMzMDcwMDc5'),
+    ZIPS,
+    INCREMENTALMERKLETREE,
     LIBRUSTZCASH,
-    Repo(('zcash', 'zcash-test-vectors'), 133857578, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMyOTMxNTEx'),
-    Repo(('zcash', 'sapling-crypto'), 111058300, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMzOTY3ODY4'),
-    Repo(('zcash', 'orchard'), 305835578, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTMyODU2MzA2'),
-    Repo(('ZcashFoundation', 'zcash_script'), 279422254, None),
-    Repo(('zcash', 'wallet'), 863610221, 'Z2lkOi8vcmFwdG9yL1JlcG9zaXRvcnkvMTM0MzU3MjQ0'),
+    ZCASH_TEST_VECTORS,
+    SAPLING_CRYPTO,
+    ORCHARD,
+    ZCASH_SCRIPT,
+    WALLET,
     ZIP32,
 ] + HALO2_REPOS
 
-POOL_DEPRECATION_REPOS = CORE_REPOS + WALLET_REPOS
+POOL_DEPRECATION_REPOS = merge(CORE_REPOS, WALLET_REPOS)
 
-ALL_REPOS = set(ECC_REPOS + ZF_REPOS + ZF_FROST_REPOS + ZCASHD_DEPRECATION_REPOS)
+# Every repo that we know about.
+ALL_REPOS = RepoSet(ECC_REPOS + ZF_REPOS + ZF_FROST_REPOS + ZCASHD_DEPRECATION_REPOS)
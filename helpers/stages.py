@@ -0,0 +1,48 @@
+import gzip
+import hashlib
+import os
+import pickle
+import time
+
+
+# A directory of the outputs ("artifacts") of expensive pipeline stages, each keyed by
+# the stage's name and inputs. Artifacts are pickled and gzipped.
+#
+# If `path` is `None`, nothing is cached and every stage is run.
+class StageCache:
+    def __init__(self, path):
+        self.path = path
+
+    def _artifact(self, stage, key):
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+        return os.path.join(self.path, '%s-%s.pickle.gz' % (stage, digest))
+
+    # Returns the output of `stage` for `key`, from its artifact if there is one (no older
+    # than `max_age` seconds, if given), and otherwise by calling `run()`.
+    #
+    # `key` must be made of values with a stable `repr`, such as strings, numbers and
+    # tuples of them.
+    def run(self, stage, key, run, max_age=None):
+        if self.path is None:
+            return run()
+
+        path = self._artifact(stage, key)
+        try:
+            if max_age is None or time.time() - os.path.getmtime(path) < max_age:
+                with gzip.open(path, 'rb') as f:
+                    value = pickle.load(f)
+                print('Using cached %s' % stage)
+                return value
+        except FileNotFoundError:
+            pass
+        except (OSError, EOFError, pickle.UnpicklingError):
+            print('Ignoring unreadable %s artifact' % stage)
+
+        value = run()
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with gzip.open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        return value
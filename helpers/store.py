@@ -0,0 +1,676 @@
+import networkx as nx
+
+import json
+import os
+import sqlite3
+
+from helpers import epics, github, zenhub
+
+# If set, the path to a local data store written by `./sync-store.py`. Scripts read
+# issues, dependency edges and epics from the store instead of the remote APIs.
+DATA_STORE = os.environ.get('DATA_STORE')
+
+# The issue fields that are synced into the store.
+SYNC_FIELDS = github.ALL_FIELDS | github.Projection(['updatedAt'])
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS issues (
+    repo INTEGER NOT NULL,
+    number INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    is_pr INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT,
+    milestone TEXT,
+    updated_at TEXT,
+    PRIMARY KEY (repo, number)
+);
+CREATE TABLE IF NOT EXISTS labels (
+    repo INTEGER NOT NULL,
+    number INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS labels_by_issue ON labels (repo, number);
+CREATE INDEX IF NOT EXISTS labels_by_name ON labels (name);
+CREATE TABLE IF NOT EXISTS edges (
+    workspace TEXT NOT NULL,
+    blocking_repo INTEGER NOT NULL,
+    blocking_number INTEGER NOT NULL,
+    blocked_repo INTEGER NOT NULL,
+    blocked_number INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS edges_by_workspace ON edges (workspace);
+CREATE TABLE IF NOT EXISTS epics (
+    workspace TEXT NOT NULL,
+    id TEXT NOT NULL,
+    repo INTEGER NOT NULL,
+    number INTEGER NOT NULL,
+    PRIMARY KEY (workspace, id)
+);
+CREATE TABLE IF NOT EXISTS epic_issues (
+    workspace TEXT NOT NULL,
+    epic TEXT NOT NULL,
+    repo INTEGER NOT NULL,
+    number INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS epic_issues_by_epic ON epic_issues (workspace, epic);
+CREATE TABLE IF NOT EXISTS changes (
+    version TEXT NOT NULL,
+    repo INTEGER NOT NULL,
+    number INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_by_version ON changes (version);
+CREATE TABLE IF NOT EXISTS view_issues (
+    view TEXT NOT NULL,
+    repo INTEGER NOT NULL,
+    number INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS view_issues_by_view ON view_issues (view);
+'''
+
+
+# Reads the data needed to render our reports from the remote GitHub and ZenHub APIs.
+#
+# This has the same read API as `Store`, so that scripts can use either.
+class Remote:
+    def __init__(self, github_token, zenhub_token):
+        self.gapi = github.api(github_token)
+        self.zapi = zenhub.api(zenhub_token)
+        self.epic_index = epics.EpicIndex(epics.EPIC_INDEX)
+
+    def iter_dependency_graph(self, workspace_id, repos):
+        return zenhub.iter_dependency_graph(self.zapi, workspace_id, repos)
+
+    def get_dependency_graph(self, workspace_id, repos):
+        return zenhub.get_dependency_graph(self.zapi, workspace_id, repos)
+
+    def get_epics(self, workspace_id, repos):
+        return zenhub.get_epics(self.zapi, workspace_id, repos)
+
+    def get_epic_index(self, workspace_id, repos, REPOS):
+        return self.epic_index.refresh(self.gapi, self.zapi, workspace_id, repos, REPOS)
+
+    def get_epic_issues(self, workspace_id, epic_id):
+        return self.epic_index.get_epic_issues(self.zapi, workspace_id, epic_id)
+
+    def issue_fetcher(self, REPOS, projection=github.ALL_FIELDS):
+        return github.IssueFetcher(self.gapi, REPOS, projection)
+
+    def download_issues(self, nodes, REPOS, projection=github.ALL_FIELDS):
+        return github.download_issues(self.gapi, nodes, REPOS, projection)
+
+    def download_issue_details(self, issues, projection):
+        return github.download_issue_details(self.gapi, issues, projection)
+
+    def download_issues_with_labels(self, labels, REPOS, projection=github.ALL_FIELDS):
+        return github.download_issues_with_labels(self.gapi, labels, REPOS, projection)
+
+    # The remote data changes at any time, so it has no version.
+    def data_version(self):
+        return None
+
+    def is_rendered(self, key, repos=None, outputs=()):
+        return False
+
+    def mark_rendered(self, key, issues=(), outputs=()):
+        pass
+
+
+# A local SQLite store of issues, labels, dependency edges, epics and epic membership,
+# filled by `./sync-store.py`.
+#
+# Reads return the same values as the corresponding `github` and `zenhub` functions, in
+# an order that only depends on the data (and not on the order in which it was written),
+# so that a store rebuilt from its records reads the same. Every issue field is synced,
+# so the `projection` arguments are ignored.
+class Store:
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self._version = None
+
+    def __repr__(self):
+        return 'Store(%s)' % self.path
+
+    def close(self):
+        self.db.close()
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, value))
+
+    # The version of the data in the store, which changes on every sync.
+    def data_version(self):
+        return self.get_meta('synced_at')
+
+    # Whether the output identified by `key` is unaffected by every change synced since it
+    # was rendered, and each of the files in `outputs` was last written for `key` (rather
+    # than for the same view with other options).
+    #
+    # A changed issue affects the output if it is in the issues recorded by `mark_rendered`
+    # (i.e. the output could have shown it), or if it is in one of `repos` (i.e. the output
+    # could newly show it). If `repos` is `None`, any change affects the output.
+    def is_rendered(self, key, repos=None, outputs=()):
+        if any(self.get_meta('output:%s' % path) != key for path in outputs):
+            return False
+
+        rendered = self.get_meta('rendered:%s' % key)
+        if rendered is None or rendered < self.get_meta('changes_since', ''):
+            # We don't have the changes since this output was rendered.
+            return False
+
+        changed = self.db.execute(
+            'SELECT DISTINCT repo, number FROM changes WHERE version > ?',
+            (rendered,),
+        ).fetchall()
+        if not changed:
+            return True
+        if repos is None:
+            return False
+
+        repo_ids = set(repo.gh_id for repo in repos)
+        if any(repo in repo_ids for (repo, _) in changed):
+            return False
+
+        return self.db.execute(
+            'SELECT 1 FROM changes c JOIN view_issues v ON c.repo = v.repo AND c.number = v.number '
+            'WHERE c.version > ? AND v.view = ? LIMIT 1',
+            (rendered, key),
+        ).fetchone() is None
+
+    # Records that the output identified by `key` was rendered from the current data, and
+    # could have shown the given `(repo, number)` issues. It was written to the files in
+    # `outputs`.
+    def mark_rendered(self, key, issues=(), outputs=()):
+        with self.db:
+            self.db.execute('DELETE FROM view_issues WHERE view = ?', (key,))
+            self.db.executemany(
+                'INSERT INTO view_issues VALUES (?, ?, ?)',
+                set((key, repo.gh_id, number) for (repo, number) in issues),
+            )
+            self.db.execute(
+                'INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                ('rendered:%s' % key, self.data_version()),
+            )
+            self.db.executemany(
+                'INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                [('output:%s' % path, key) for path in outputs],
+            )
+
+    #
+    # Read API
+    #
+
+    def iter_dependency_graph(self, workspace_id, repos):
+        repo_ids = set(repo.gh_id for repo in repos)
+        yield [
+            (
+                (zenhub.repo_lookup(blocking_repo), blocking_number),
+                (zenhub.repo_lookup(blocked_repo), blocked_number),
+            )
+            for (blocking_repo, blocking_number, blocked_repo, blocked_number) in self.db.execute(
+                'SELECT blocking_repo, blocking_number, blocked_repo, blocked_number '
+                'FROM edges WHERE workspace = ? '
+                'ORDER BY blocking_repo, blocking_number, blocked_repo, blocked_number',
+                (workspace_id,),
+            )
+            if blocking_repo in repo_ids or blocked_repo in repo_ids
+        ]
+
+    def get_dependency_graph(self, workspace_id, repos):
+        edges = []
+        for page in self.iter_dependency_graph(workspace_id, repos):
+            edges += page
+        return nx.DiGraph(edges)
+
+    def get_epics(self, workspace_id, repos):
+        repo_ids = set(repo.gh_id for repo in repos)
+        return [
+            (epic_id, (zenhub.repo_lookup(repo), number))
+            for (epic_id, repo, number) in self.db.execute(
+                'SELECT id, repo, number FROM epics WHERE workspace = ? ORDER BY repo, number, id',
+                (workspace_id,),
+            )
+            if repo in repo_ids
+        ]
+
+    def get_epic_index(self, workspace_id, repos, REPOS):
+        return _epic_index(self, workspace_id, repos, REPOS)
+
+    def get_epic_issues(self, workspace_id, epic_id):
+        return [
+            (zenhub.repo_lookup(repo), number)
+            for (repo, number) in self.db.execute(
+                'SELECT repo, number FROM epic_issues WHERE workspace = ? AND epic = ? ORDER BY repo, number',
+                (workspace_id, epic_id),
+            )
+        ]
+
+    def issue_fetcher(self, REPOS, projection=github.ALL_FIELDS):
+        return _StoreFetcher(self, REPOS)
+
+    # Returns the issue data for `(repo_id, number)` in the form returned by GitHub,
+    # or `None` if the issue isn't in the store.
+    def _issue_data(self, repo_id, number):
+        row = self.db.execute(
+            'SELECT state, is_pr, title, url, milestone, updated_at FROM issues '
+            'WHERE repo = ? AND number = ?',
+            (repo_id, number),
+        ).fetchone()
+        if row is None:
+            return None
+
+        (state, is_pr, title, url, milestone, updated_at) = row
+        data = {
+            'state': 'CLOSED' if state == 'closed' else 'OPEN',
+            'title': title,
+            'url': url,
+            'milestone': {'title': milestone} if milestone is not None else None,
+            'updatedAt': updated_at,
+            'labels': {'nodes': [
+                {'name': name}
+                for (name,) in self.db.execute(
+                    'SELECT name FROM labels WHERE repo = ? AND number = ?',
+                    (repo_id, number),
+                )
+            ]},
+        }
+        if is_pr:
+            # We don't track whether closed PRs were merged; only its presence is read.
+            data['merged'] = None
+        return data
+
+    def download_issues(self, nodes, REPOS, projection=github.ALL_FIELDS):
+        return {
+            (repo, issue): github.GitHubIssue(
+                repo,
+                issue,
+                self._issue_data(repo.gh_id, issue) if repo in REPOS else None,
+                REPOS,
+            )
+            for (repo, issue) in nodes
+        }
+
+    def download_issue_details(self, issues, projection):
+        for n in issues:
+            if n.repo in n._REPOS:
+                data = self._issue_data(n.repo.gh_id, n.issue_number)
+                if data is not None:
+                    n.update(data)
+
+    def download_issues_with_labels(self, labels, REPOS, projection=github.ALL_FIELDS):
+        repo_map = {repo.gh_id: repo for repo in REPOS}
+        ret = {}
+        for (repo_id, number) in self.db.execute(
+            'SELECT DISTINCT repo, number FROM labels WHERE name IN (%s) ORDER BY repo, number' % (
+                ', '.join('?' * len(labels))),
+            labels,
+        ):
+            if repo_id in repo_map:
+                repo = repo_map[repo_id]
+                ret[(repo, number)] = github.GitHubIssue(
+                    repo, number, self._issue_data(repo_id, number), REPOS)
+        return ret
+
+    #
+    # Write API
+    #
+
+    # Starts a sync that will become data version `version`. Every issue whose data,
+    # dependencies or epic membership differ from the previous sync is recorded as changed
+    # in that version.
+    def begin_sync(self, version):
+        self._version = version
+
+    def finish_sync(self, fingerprint, retain_changes):
+        with self.db:
+            if self.data_version() is None:
+                # There is no earlier data for changes to be relative to.
+                self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('changes_since', self._version))
+            elif retain_changes is not None and retain_changes < self._version:
+                self.db.execute('DELETE FROM changes WHERE version <= ?', (retain_changes,))
+                self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('changes_since', retain_changes))
+            self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('fingerprint', fingerprint))
+            self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('synced_at', self._version))
+        self._version = None
+
+    def _record_changes(self, issues):
+        if self._version is not None:
+            self.db.executemany(
+                'INSERT INTO changes VALUES (?, ?, ?)',
+                [(self._version, repo, number) for (repo, number) in set(issues)],
+            )
+
+    def _issue_row(self, key):
+        row = self.db.execute(
+            'SELECT state, is_pr, title, url, milestone, updated_at FROM issues '
+            'WHERE repo = ? AND number = ?',
+            key,
+        ).fetchone()
+        labels = self.db.execute(
+            'SELECT name FROM labels WHERE repo = ? AND number = ? ORDER BY name',
+            key,
+        ).fetchall()
+        return (row, [name for (name,) in labels])
+
+    def put_issues(self, issues):
+        with self.db:
+            changed = []
+            for n in issues:
+                if n.url is None:
+                    # We couldn't fetch this issue.
+                    continue
+                key = (n.repo.gh_id, n.issue_number)
+                row = (n.state, int(n.is_pr), n.title, n.url, n.milestone, n.updated_at)
+                if self._issue_row(key) == (row, sorted(n.labels)):
+                    continue
+                changed.append(key)
+                self.db.execute('INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?)', key + row)
+                self.db.execute('DELETE FROM labels WHERE repo = ? AND number = ?', key)
+                self.db.executemany(
+                    'INSERT INTO labels VALUES (?, ?, ?)',
+                    [key + (name,) for name in n.labels],
+                )
+            self._record_changes(changed)
+
+    # Removes each of `labels` from every issue other than the `(Repo, number)` issues in
+    # `keep`. A sync passes the issues that it found with the labels, because an issue
+    # that has lost them isn't otherwise fetched again unless it is in a graph or epic.
+    def remove_labels(self, labels, keep):
+        keep = set((repo.gh_id, number) for (repo, number) in keep)
+        names = ', '.join('?' * len(labels))
+        with self.db:
+            stale = [
+                key
+                for key in self.db.execute(
+                    'SELECT DISTINCT repo, number FROM labels WHERE name IN (%s)' % names,
+                    labels,
+                )
+                if key not in keep
+            ]
+            self._record_changes(stale)
+            self.db.executemany(
+                'DELETE FROM labels WHERE repo = ? AND number = ? AND name IN (%s)' % names,
+                [key + tuple(labels) for key in stale],
+            )
+
+    def put_dependency_graph(self, workspace_id, edges):
+        edges = [
+            ((blocking_repo.gh_id, blocking), (blocked_repo.gh_id, blocked))
+            for ((blocking_repo, blocking), (blocked_repo, blocked)) in edges
+        ]
+        with self.db:
+            old = set(
+                ((blocking_repo, blocking), (blocked_repo, blocked))
+                for (blocking_repo, blocking, blocked_repo, blocked) in self.db.execute(
+                    'SELECT blocking_repo, blocking_number, blocked_repo, blocked_number '
+                    'FROM edges WHERE workspace = ?',
+                    (workspace_id,),
+                )
+            )
+            # Both ends of an added or removed edge have changed.
+            self._record_changes(n for edge in set(edges) ^ old for n in edge)
+
+            self.db.execute('DELETE FROM edges WHERE workspace = ?', (workspace_id,))
+            self.db.executemany(
+                'INSERT INTO edges VALUES (?, ?, ?, ?, ?)',
+                [(workspace_id,) + blocking + blocked for (blocking, blocked) in edges],
+            )
+
+    def put_epics(self, workspace_id, epics):
+        epics = [(epic_id, repo.gh_id, number) for (epic_id, (repo, number)) in epics]
+        with self.db:
+            old = set(self.db.execute(
+                'SELECT id, repo, number FROM epics WHERE workspace = ?',
+                (workspace_id,),
+            ))
+            self._record_changes((repo, number) for (_, repo, number) in set(epics) ^ old)
+
+            self.db.execute('DELETE FROM epics WHERE workspace = ?', (workspace_id,))
+            self.db.executemany(
+                'INSERT INTO epics VALUES (?, ?, ?, ?)',
+                [(workspace_id,) + epic for epic in epics],
+            )
+
+    def put_epic_issues(self, workspace_id, epic_id, issues):
+        issues = [(repo.gh_id, number) for (repo, number) in issues]
+        with self.db:
+            old = set(self.db.execute(
+                'SELECT repo, number FROM epic_issues WHERE workspace = ? AND epic = ?',
+                (workspace_id, epic_id),
+            ))
+            if set(issues) != old:
+                # The epic itself has changed, along with the issues added or removed.
+                self._record_changes(list(set(issues) ^ old) + self.db.execute(
+                    'SELECT repo, number FROM epics WHERE workspace = ? AND id = ?',
+                    (workspace_id, epic_id),
+                ).fetchall())
+
+            self.db.execute(
+                'DELETE FROM epic_issues WHERE workspace = ? AND epic = ?',
+                (workspace_id, epic_id),
+            )
+            self.db.executemany(
+                'INSERT INTO epic_issues VALUES (?, ?, ?, ?)',
+                [(workspace_id, epic_id) + issue for issue in issues],
+            )
+
+    #
+    # Incremental updates, for applying events between syncs
+    #
+
+    def add_edge(self, workspace_id, blocking, blocked):
+        with self.db:
+            self._record_changes([blocking, blocked])
+            self.db.execute('INSERT INTO edges VALUES (?, ?, ?, ?, ?)', (workspace_id,) + blocking + blocked)
+
+    def remove_edge(self, workspace_id, blocking, blocked):
+        with self.db:
+            self._record_changes([blocking, blocked])
+            self.db.execute(
+                'DELETE FROM edges WHERE workspace = ? AND blocking_repo = ? AND blocking_number = ? '
+                'AND blocked_repo = ? AND blocked_number = ?',
+                (workspace_id,) + blocking + blocked,
+            )
+
+    def add_epic_issue(self, workspace_id, epic_id, issue):
+        self.remove_epic_issue(workspace_id, epic_id, issue)
+        with self.db:
+            self.db.execute('INSERT INTO epic_issues VALUES (?, ?, ?, ?)', (workspace_id, epic_id) + issue)
+
+    def remove_epic_issue(self, workspace_id, epic_id, issue):
+        with self.db:
+            self._record_changes([issue] + self.db.execute(
+                'SELECT repo, number FROM epics WHERE workspace = ? AND id = ?',
+                (workspace_id, epic_id),
+            ).fetchall())
+            self.db.execute(
+                'DELETE FROM epic_issues WHERE workspace = ? AND epic = ? AND repo = ? AND number = ?',
+                (workspace_id, epic_id) + issue,
+            )
+
+    # Renames the label `name` on every issue in the given repo, or removes it if
+    # `new_name` is `None`.
+    def rename_label(self, repo_id, name, new_name):
+        with self.db:
+            self._record_changes(self.db.execute(
+                'SELECT repo, number FROM labels WHERE repo = ? AND name = ?',
+                (repo_id, name),
+            ).fetchall())
+            if new_name is None:
+                self.db.execute('DELETE FROM labels WHERE repo = ? AND name = ?', (repo_id, name))
+            else:
+                self.db.execute(
+                    'UPDATE labels SET name = ? WHERE repo = ? AND name = ?',
+                    (new_name, repo_id, name),
+                )
+
+    # Renames the milestone `title` in the given repo, or removes it if `new_title` is
+    # `None`.
+    def rename_milestone(self, repo_id, title, new_title):
+        with self.db:
+            self._record_changes(self.db.execute(
+                'SELECT repo, number FROM issues WHERE repo = ? AND milestone = ?',
+                (repo_id, title),
+            ).fetchall())
+            self.db.execute(
+                'UPDATE issues SET milestone = ? WHERE repo = ? AND milestone = ?',
+                (new_title, repo_id, title),
+            )
+
+    #
+    # Records, for keeping the history of the store
+    #
+
+    # Returns the synced data as a dict of records, keyed by a JSON array that identifies
+    # each issue, edge, epic or epic issue, in order of their keys. Every record differs if
+    # any of its data does, so the difference between the records of two syncs is what
+    # changed between them.
+    def records(self):
+        ret = {}
+        labels = {}
+        for (repo, number, name) in self.db.execute('SELECT repo, number, name FROM labels'):
+            labels.setdefault((repo, number), []).append(name)
+        for (repo, number, state, is_pr, title, url, milestone, updated_at) in self.db.execute(
+            'SELECT repo, number, state, is_pr, title, url, milestone, updated_at FROM issues',
+        ):
+            ret[json.dumps(['issue', repo, number])] = [
+                state, is_pr, title, url, milestone, updated_at, labels.get((repo, number), [])]
+        for row in self.db.execute(
+            'SELECT workspace, blocking_repo, blocking_number, blocked_repo, blocked_number FROM edges',
+        ):
+            ret[json.dumps(['edge'] + list(row))] = 1
+        for (workspace, epic_id, repo, number) in self.db.execute('SELECT workspace, id, repo, number FROM epics'):
+            ret[json.dumps(['epic', workspace, epic_id])] = [repo, number]
+        for row in self.db.execute('SELECT workspace, epic, repo, number FROM epic_issues'):
+            ret[json.dumps(['epic_issue'] + list(row))] = 1
+        return dict(sorted(ret.items()))
+
+    # Replaces the synced data with `records` (as returned by `records`), as of data
+    # version `version`.
+    def put_records(self, records, version):
+        with self.db:
+            for table in ['issues', 'labels', 'edges', 'epics', 'epic_issues', 'changes', 'view_issues']:
+                self.db.execute('DELETE FROM %s' % table)
+            for (key, value) in sorted(records.items()):
+                key = json.loads(key)
+                if key[0] == 'issue':
+                    self.db.execute('INSERT INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?)', key[1:] + value[:6])
+                    self.db.executemany(
+                        'INSERT INTO labels VALUES (?, ?, ?)',
+                        [key[1:] + [name] for name in value[6]],
+                    )
+                elif key[0] == 'edge':
+                    self.db.execute('INSERT INTO edges VALUES (?, ?, ?, ?, ?)', key[1:])
+                elif key[0] == 'epic':
+                    self.db.execute('INSERT INTO epics VALUES (?, ?, ?, ?)', key[1:] + value)
+                elif key[0] == 'epic_issue':
+                    self.db.execute('INSERT INTO epic_issues VALUES (?, ?, ?, ?)', key[1:])
+            self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('changes_since', version))
+            self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('synced_at', version))
+
+
+# A snapshot of the data for one view, taken from `Remote` or `Store` with every issue
+# field. It has the same read API, so that a view can be rebuilt from it with different
+# options without reading the original data source again.
+class Snapshot:
+    def __init__(self, data_source, workspaces, REPOS, epics=True):
+        self.edges = {}
+        self.epics = {}
+        self.epic_issues = {}
+
+        fetcher = data_source.issue_fetcher(REPOS, github.ALL_FIELDS)
+        for (workspace_id, repos) in workspaces.items():
+            self.edges[workspace_id] = []
+            for page in data_source.iter_dependency_graph(workspace_id, repos):
+                self.edges[workspace_id] += page
+                fetcher.submit(n for edge in page for n in edge)
+
+            if epics:
+                # Only open epics are shown, so we only need their issues.
+                self.epics[workspace_id] = []
+                for (epic_id, epic) in data_source.get_epic_index(workspace_id, repos, REPOS):
+                    gh_ref = (epic.repo, epic.issue_number)
+                    self.epics[workspace_id].append((epic_id, gh_ref))
+                    if epic.state != 'closed':
+                        fetcher.submit([gh_ref])
+                        issues = data_source.get_epic_issues(workspace_id, epic_id)
+                        self.epic_issues[(workspace_id, epic_id)] = issues
+                        fetcher.submit(issues)
+
+        self.issues = {
+            (n.repo, n.issue_number): n.data()
+            for n in fetcher.result().values()
+            if n.url is not None
+        }
+
+    def iter_dependency_graph(self, workspace_id, repos):
+        yield self.edges[workspace_id]
+
+    def get_dependency_graph(self, workspace_id, repos):
+        return nx.DiGraph(self.edges[workspace_id])
+
+    def get_epics(self, workspace_id, repos):
+        return self.epics[workspace_id]
+
+    def get_epic_index(self, workspace_id, repos, REPOS):
+        return _epic_index(self, workspace_id, repos, REPOS)
+
+    def get_epic_issues(self, workspace_id, epic_id):
+        return self.epic_issues.get((workspace_id, epic_id), [])
+
+    def issue_fetcher(self, REPOS, projection=github.ALL_FIELDS):
+        return _StoreFetcher(self, REPOS)
+
+    def download_issues(self, nodes, REPOS, projection=github.ALL_FIELDS):
+        return {
+            (repo, issue): github.GitHubIssue(
+                repo,
+                issue,
+                self.issues.get((repo, issue)) if repo in REPOS else None,
+                REPOS,
+            )
+            for (repo, issue) in nodes
+        }
+
+    def download_issue_details(self, issues, projection):
+        # `download_issues` already set every field.
+        pass
+
+
+# Returns `(epic_id, epic)` for each epic in `workspace_id`, as `Remote.get_epic_index`
+# does, from a data source that has every issue locally.
+def _epic_index(data_source, workspace_id, repos, REPOS):
+    epics = data_source.get_epics(workspace_id, repos)
+    issues = data_source.download_issues([gh_ref for (_, gh_ref) in epics], REPOS)
+    return [(epic_id, issues[gh_ref]) for (epic_id, gh_ref) in epics]
+
+
+class _StoreFetcher:
+    def __init__(self, store, REPOS):
+        self._store = store
+        self._REPOS = REPOS
+        self._nodes = set()
+
+    def submit(self, nodes):
+        self._nodes.update(nodes)
+
+    def result(self):
+        return self._store.download_issues(self._nodes, self._REPOS)
+
+
+# Returns the store at `DATA_STORE` if set, and otherwise the remote APIs.
+def open_source(github_token, zenhub_token):
+    if DATA_STORE:
+        return Store(DATA_STORE)
+    else:
+        return Remote(github_token, zenhub_token)
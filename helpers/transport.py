@@ -0,0 +1,141 @@
+import gzip
+import http.client
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from helpers import metrics
+
+try:
+    import httpx
+    import h2  # noqa: F401
+except ImportError:
+    httpx = None
+
+# Timeout in seconds for connecting to, and each read from, a GraphQL endpoint.
+TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', '60'))
+
+
+# Idle keep-alive connections, per `(scheme, host)`.
+class ConnectionPool:
+    def __init__(self, timeout=TIMEOUT):
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, scheme, host):
+        with self._lock:
+            idle = self._idle.get((scheme, host))
+            if idle:
+                return (idle.pop(), True)
+
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(host, timeout=self.timeout)
+        return (conn, False)
+
+    def release(self, scheme, host, conn):
+        with self._lock:
+            self._idle.setdefault((scheme, host), []).append(conn)
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle = {}
+
+
+_pool = ConnectionPool()
+
+
+# A GraphQL endpoint that reuses connections to its host across requests, and accepts
+# gzip-compressed responses.
+#
+# Calling it with a query and variables returns the decoded JSON response, like sgqlc's
+# `HTTPEndpoint`. HTTP errors are returned as a response with an `errors` section.
+#
+# If `httpx` is installed with HTTP/2 support, it is used instead.
+class Endpoint:
+    def __init__(self, url, headers, timeout=TIMEOUT, pool=None):
+        self.url = url
+        self.headers = dict(headers)
+        self.headers['Accept'] = 'application/json'
+        self.headers['Accept-Encoding'] = 'gzip'
+        self.headers['Content-Type'] = 'application/json; charset=utf-8'
+
+        parts = urlsplit(url)
+        self._scheme = parts.scheme
+        self._host = parts.netloc
+        self._path = parts.path or '/'
+        if parts.query:
+            self._path += '?' + parts.query
+
+        if httpx is not None and pool is None:
+            self._client = httpx.Client(http2=True, timeout=timeout)
+            self._pool = None
+        else:
+            self._client = None
+            self._pool = pool or (_pool if timeout == TIMEOUT else ConnectionPool(timeout))
+
+    def __repr__(self):
+        return 'Endpoint(%s)' % self.url
+
+    def __call__(self, query, variables=None):
+        body = json.dumps({'query': query, 'variables': variables or {}}).encode('utf-8')
+        started = time.perf_counter()
+
+        if self._client is not None:
+            res = self._client.post(self.url, content=body, headers=self.headers)
+            metrics.request(
+                self.url, time.perf_counter() - started, len(body), res.num_bytes_downloaded,
+                res.status_code, res.headers)
+            return _decode(res.status_code, res.reason_phrase, res.content)
+
+        (status, reason, data, received, headers) = self._post(body)
+        metrics.request(self.url, time.perf_counter() - started, len(body), received, status, headers)
+        return _decode(status, reason, data)
+
+    def _post(self, body):
+        (conn, reused) = self._pool.acquire(self._scheme, self._host)
+        try:
+            conn.request('POST', self._path, body, self.headers)
+            res = conn.getresponse()
+            data = res.read()
+            received = len(data)
+        except (http.client.RemoteDisconnected, ConnectionError):
+            conn.close()
+            if reused:
+                # The server closed the idle connection; retry on a fresh one.
+                return self._post(body)
+            raise
+        except Exception:
+            conn.close()
+            raise
+
+        if res.getheader('Content-Encoding', '').lower() == 'gzip':
+            data = gzip.decompress(data)
+
+        if res.will_close:
+            conn.close()
+        else:
+            self._pool.release(self._scheme, self._host, conn)
+
+        return (res.status, res.reason, data, received, res.headers)
+
+
+def _decode(status, reason, data):
+    try:
+        d = json.loads(data.decode('utf-8'))
+    except ValueError:
+        d = None
+
+    if status >= 400 and not (isinstance(d, dict) and 'errors' in d):
+        d = {'data': None, 'errors': [{'message': 'HTTP %d: %s' % (status, reason)}]}
+    elif not isinstance(d, dict):
+        d = {'data': None, 'errors': [{'message': 'Invalid JSON response'}]}
+
+    return d
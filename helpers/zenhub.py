@@ -1,9 +1,13 @@
 import networkx as nx
-from sgqlc.endpoint.http import HTTPEndpoint
-from sgqlc.operation import Operation
 
+import json
+import os
+import threading
+
+from helpers import graphql, transport
 from helpers.repos import ALL_REPOS, CORE_REPOS, TFL_REPOS, WALLET_REPOS, ZF_REPOS, ZF_FROST_REPOS, Repo
-from zenhub_schema import zenhub_schema
+
+SCHEMA = 'zenhub_schema.json'
 
 WORKSPACE_SETS = {
     # ecc-core
@@ -16,165 +20,261 @@ WORKSPACE_SETS = {
     '607d75e0169bd50011d5410f': ZF_FROST_REPOS,
 }
 
-REPO_MAP = {repo.gh_id: repo for repo in ALL_REPOS}
+# The path of the cache of the ZenHub IDs that we discovered for repos which don't have
+# one in `helpers/repos.py`. By default it is kept next to the data store at DATA_STORE,
+# and not kept at all if that isn't set. Set to an empty string to disable the cache.
+ZENHUB_ID_CACHE = os.environ.get('ZENHUB_ID_CACHE', os.path.join(
+    os.path.dirname(os.environ['DATA_STORE']), 'zenhub-repo-ids.json',
+) if os.environ.get('DATA_STORE') else '')
 
 
 def repo_lookup(repo_id):
     try:
-        return REPO_MAP[repo_id]
+        return ALL_REPOS.by_gh_id[repo_id]
     except KeyError:
         return Repo(None, repo_id, None)
 
 
 def api(token):
-    return HTTPEndpoint(
-        'https://api.zenhub.com/public/graphql',
+    return transport.Endpoint(
+        os.environ.get('ZENHUB_GRAPHQL_URL', 'https://api.zenhub.com/public/graphql'),
         {'Authorization': 'Bearer %s' % token},
     )
 
 
-def fetch_workspace_repos(op, workspace_id):
-    repos = op.workspace(id=workspace_id).repositories()
-    repos.id()
-    repos.gh_id()
-    repos.name()
-    repos.owner.login()
+WORKSPACE_REPOS_QUERY = '''
+query($workspaceId: ID!) {
+  workspace(id: $workspaceId) {
+    repositories { id ghId name owner { login } }
+  }
+}'''
 
 
 def get_workspace_repos(endpoint, workspaces):
     repos = []
 
     for workspace_id in workspaces:
-        op = Operation(zenhub_schema.Query)
-        fetch_workspace_repos(op, workspace_id)
-
-        d = endpoint(op)
-        data = op + d
+        data = graphql.query(endpoint, SCHEMA, WORKSPACE_REPOS_QUERY, {'workspaceId': workspace_id})
 
-        if hasattr(data.workspace, 'repositories'):
+        workspace = data.get('workspace') or {}
+        if workspace.get('repositories') is not None:
             repos += [
-                ((repo.owner.login, repo.name), repo.gh_id, repo.id)
-                for repo in data.workspace.repositories
+                ((repo['owner']['login'], repo['name']), repo['ghId'], repo['id'])
+                for repo in workspace['repositories']
             ]
 
     return repos
 
 
-def fetch_workspace_graph(op, workspace_id, repos, cursor):
+_zh_ids_lock = threading.Lock()
+_zh_ids_loaded = False
+_zh_ids_fetched = set()
+_zh_ids_discovered = {}
+
+
+def _load_zh_ids():
+    global _zh_ids_loaded
+    _zh_ids_loaded = True
+    if not ZENHUB_ID_CACHE or not os.path.exists(ZENHUB_ID_CACHE):
+        return
+    with open(ZENHUB_ID_CACHE) as f:
+        for (gh_id, zh_id) in json.load(f).items():
+            repo = ALL_REPOS.by_gh_id.get(int(gh_id))
+            if repo is not None and repo.zh_id is None:
+                repo.zh_id = zh_id
+                _zh_ids_discovered[repo.gh_id] = zh_id
+
+
+def _save_zh_ids():
+    if not ZENHUB_ID_CACHE:
+        return
+    zh_ids = {}
+    if os.path.exists(ZENHUB_ID_CACHE):
+        with open(ZENHUB_ID_CACHE) as f:
+            zh_ids = json.load(f)
+    zh_ids.update({str(gh_id): zh_id for (gh_id, zh_id) in _zh_ids_discovered.items()})
+
+    os.makedirs(os.path.dirname(ZENHUB_ID_CACHE) or '.', exist_ok=True)
+    tmp = '%s.tmp' % ZENHUB_ID_CACHE
+    with open(tmp, 'w') as f:
+        json.dump(zh_ids, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp, ZENHUB_ID_CACHE)
+
+
+# Records the ZenHub IDs of known repos in `workspace_repos`, as returned by
+# `get_workspace_repos`, and caches them at `ZENHUB_ID_CACHE`.
+def cache_zh_ids(workspace_repos):
+    for (_, gh_id, zh_id) in workspace_repos:
+        repo = ALL_REPOS.by_gh_id.get(gh_id)
+        if repo is not None and repo.zh_id in [None, _zh_ids_discovered.get(gh_id)]:
+            repo.zh_id = zh_id
+            _zh_ids_discovered[gh_id] = zh_id
+    _save_zh_ids()
+
+
+# Fills in the ZenHub IDs of any of `repos` that we don't know yet, from the cache at
+# `ZENHUB_ID_CACHE` or else from the repos in `workspace_id` (which we then cache). Each
+# workspace is only asked once per run.
+def resolve_zh_ids(endpoint, workspace_id, repos):
+    with _zh_ids_lock:
+        if not _zh_ids_loaded:
+            _load_zh_ids()
+        if all(repo.zh_id is not None for repo in repos) or workspace_id in _zh_ids_fetched:
+            return
+        _zh_ids_fetched.add(workspace_id)
+        cache_zh_ids(get_workspace_repos(endpoint, [workspace_id]))
+
+
+WORKSPACE_GRAPH_QUERY = '''
+query($workspaceId: ID!, $repositoryIds: [ID!], $cursor: String) {
+  workspace(id: $workspaceId) {
+    issueDependencies(repositoryIds: $repositoryIds, first: 100, after: $cursor) {
+      nodes {
+        id
+        blockedIssue { number repository { ghId } }
+        blockingIssue { number repository { ghId } }
+      }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}'''
+
+
+def fetch_workspace_graph(workspace_id, repos, cursor):
     # If we know all repo ZenHub IDs, we can filter.
     # Otherwise, we need to fetch all repos in the workspace.
     repository_ids = [repo.zh_id for repo in repos]
     if None in repository_ids:
         repository_ids = None
 
-    dependencies = op.workspace(id=workspace_id).issue_dependencies(
-        repository_ids=repository_ids,
-        first=100,
-        after=cursor,
-    )
-    dependencies.nodes.id()
-    dependencies.nodes.blocked_issue.number()
-    dependencies.nodes.blocked_issue.repository.gh_id()
-    dependencies.nodes.blocking_issue.number()
-    dependencies.nodes.blocking_issue.repository.gh_id()
-    dependencies.page_info.has_next_page()
-    dependencies.page_info.end_cursor()
+    return (WORKSPACE_GRAPH_QUERY, {
+        'workspaceId': workspace_id,
+        'repositoryIds': repository_ids,
+        'cursor': cursor,
+    })
 
 
-# Fetches the dependency graph involving the given `repos` from the given `workspace_id`.
-#
-# `repos` is a list of `Repo` objects.
+# Yields the pages of `connection` (e.g. `issueDependencies`) within the `workspace`
+# returned by successive queries, printing progress as it goes.
 #
-# Returns a list of `(blocking, blocked)` tuples corresponding to DAG edges.
-# `blocking` and `blocked` are both `(Repo, issue_number)` tuples.
-def get_dependency_graph(endpoint, workspace_id, repos):
-    edges = []
+# `fetch` is called with each cursor and returns a `(query, variables)` tuple.
+def _paginate(endpoint, fetch, connection):
     cursor = None
 
     while True:
-        op = Operation(zenhub_schema.Query)
-        fetch_workspace_graph(op, workspace_id, repos, cursor)
-
-        d = endpoint(op)
-        data = op + d
-
-        if hasattr(data.workspace, 'issue_dependencies'):
-            dependencies = data.workspace.issue_dependencies
-            edges += [
-                (
-                    (repo_lookup(node.blocking_issue.repository.gh_id), node.blocking_issue.number),
-                    (repo_lookup(node.blocked_issue.repository.gh_id), node.blocked_issue.number),
-                )
-                for node in dependencies.nodes
-            ]
+        data = graphql.query(endpoint, SCHEMA, *fetch(cursor))
 
-            if dependencies.page_info.has_next_page:
-                cursor = dependencies.page_info.end_cursor
-                print('.', end='', flush=True)
-            else:
-                print()
-                break
+        workspace = data.get('workspace') or {}
+        page = workspace.get(connection)
+        if page is None:
+            print()
+            break
+
+        yield page['nodes']
+
+        if page['pageInfo']['hasNextPage']:
+            cursor = page['pageInfo']['endCursor']
+            print('.', end='', flush=True)
         else:
             print()
             break
 
+
+# Fetches the dependency graph involving the given `repos` from the given `workspace_id`,
+# yielding each page of edges as soon as it is received.
+#
+# `repos` is a list of `Repo` objects.
+#
+# Yields lists of `(blocking, blocked)` tuples corresponding to DAG edges.
+# `blocking` and `blocked` are both `(Repo, issue_number)` tuples.
+def iter_dependency_graph(endpoint, workspace_id, repos):
+    resolve_zh_ids(endpoint, workspace_id, repos)
+    for nodes in _paginate(
+        endpoint,
+        lambda cursor: fetch_workspace_graph(workspace_id, repos, cursor),
+        'issueDependencies',
+    ):
+        yield [
+            (
+                (repo_lookup(node['blockingIssue']['repository']['ghId']), node['blockingIssue']['number']),
+                (repo_lookup(node['blockedIssue']['repository']['ghId']), node['blockedIssue']['number']),
+            )
+            for node in nodes
+        ]
+
+
+# Fetches the dependency graph involving the given `repos` from the given `workspace_id`.
+#
+# Returns an `nx.DiGraph` whose edges are `(blocking, blocked)` tuples, as yielded by
+# `iter_dependency_graph`.
+def get_dependency_graph(endpoint, workspace_id, repos):
+    edges = []
+    for page in iter_dependency_graph(endpoint, workspace_id, repos):
+        edges += page
+
     return nx.DiGraph(edges)
 
 
-def fetch_epics(op, workspace_id, repos, cursor):
-    epics = op.workspace(id=workspace_id).epics(
-        repository_gh_ids=[repo.gh_id for repo in repos],
-        first=100,
-        after=cursor,
-    )
-    epics.nodes.id()
-    epics.nodes.issue.number()
-    epics.nodes.issue.repository.gh_id()
-    epics.page_info.has_next_page()
-    epics.page_info.end_cursor()
+EPICS_QUERY = '''
+query($workspaceId: ID!, $repositoryGhIds: [Int!], $cursor: String) {
+  workspace(id: $workspaceId) {
+    epics(repositoryGhIds: $repositoryGhIds, first: 100, after: $cursor) {
+      nodes {
+        id
+        issue { number repository { ghId } }
+      }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}'''
+
+
+def fetch_epics(workspace_id, repos, cursor):
+    return (EPICS_QUERY, {
+        'workspaceId': workspace_id,
+        'repositoryGhIds': [repo.gh_id for repo in repos],
+        'cursor': cursor,
+    })
 
 
 def get_epics(endpoint, workspace_id, repos):
     epics = []
-    cursor = None
-
-    while True:
-        op = Operation(zenhub_schema.Query)
-        fetch_epics(op, workspace_id, repos, cursor)
 
-        d = endpoint(op)
-        data = op + d
+    for nodes in _paginate(
+        endpoint,
+        lambda cursor: fetch_epics(workspace_id, repos, cursor),
+        'epics',
+    ):
+        epics += [
+            (node['id'], (repo_lookup(node['issue']['repository']['ghId']), node['issue']['number']))
+            for node in nodes
+        ]
 
-        if hasattr(data.workspace, 'epics'):
-            epics_page = data.workspace.epics
-            epics += [
-                (node.id, (repo_lookup(node.issue.repository.gh_id), node.issue.number))
-                for node in epics_page.nodes
-            ]
+    return epics
 
-            if epics_page.page_info.has_next_page:
-                cursor = epics_page.page_info.end_cursor
-                print('.', end='', flush=True)
-            else:
-                print()
-                break
-        else:
-            print()
-            break
 
-    return epics
+EPIC_ISSUES_QUERY = '''
+query($workspaceId: ID!, $epicIds: [ID!], $cursor: String) {
+  workspace(id: $workspaceId) {
+    epics(ids: $epicIds) {
+      nodes {
+        childIssues(first: 100, after: $cursor) {
+          nodes { number repository { ghId } }
+          pageInfo { hasNextPage endCursor }
+        }
+      }
+    }
+  }
+}'''
 
 
-def fetch_epic_issues(op, workspace_id, epic_id, cursor):
-    epic = op.workspace(id=workspace_id).epics(ids=[epic_id])
-    child_issues = epic.nodes.child_issues(
-        first=100,
-        after=cursor,
-    )
-    child_issues.nodes.number()
-    child_issues.nodes.repository.gh_id()
-    child_issues.page_info.has_next_page()
-    child_issues.page_info.end_cursor()
+def fetch_epic_issues(workspace_id, epic_id, cursor):
+    return (EPIC_ISSUES_QUERY, {
+        'workspaceId': workspace_id,
+        'epicIds': [epic_id],
+        'cursor': cursor,
+    })
 
 
 def get_epic_issues(endpoint, workspace_id, epic_id):
@@ -182,23 +282,66 @@ def get_epic_issues(endpoint, workspace_id, epic_id):
     cursor = None
 
     while True:
-        op = Operation(zenhub_schema.Query)
-        fetch_epic_issues(op, workspace_id, epic_id, cursor)
-
-        d = endpoint(op)
-        data = op + d
+        data = graphql.query(endpoint, SCHEMA, *fetch_epic_issues(workspace_id, epic_id, cursor))
 
-        epic = data.workspace.epics.nodes[0]
+        child_issues = data['workspace']['epics']['nodes'][0]['childIssues']
         epic_issues += [
-            (repo_lookup(node.repository.gh_id), node.number)
-            for node in epic.child_issues.nodes
+            (repo_lookup(node['repository']['ghId']), node['number'])
+            for node in child_issues['nodes']
         ]
 
-        if epic.child_issues.page_info.has_next_page:
-            cursor = epic.child_issues.page_info.end_cursor
+        if child_issues['pageInfo']['hasNextPage']:
+            cursor = child_issues['pageInfo']['endCursor']
             print('.', end='', flush=True)
         else:
             print()
             break
 
     return epic_issues
+
+
+# Builds a query fetching the number of dependencies and epics in each of the given
+# workspaces, and its variables.
+def fetch_workspace_activity(workspaces):
+    params = []
+    selections = []
+    variables = {}
+    for (i, workspace_id) in enumerate(workspaces):
+        params.append('$workspace%d: ID!' % i)
+        variables['workspace%d' % i] = workspace_id
+        selections.append(
+            'workspace%d: workspace(id: $workspace%d) { '
+            'issueDependencies(first: 1) { totalCount } '
+            'epics(first: 1) { totalCount } '
+            '}' % (i, i)
+        )
+
+    query = 'query(%s) {\n%s\n}' % (', '.join(params), '\n'.join(selections))
+    return (query, variables)
+
+
+# Returns a dict mapping each of the given workspaces to a `(dependencies, epics)` tuple
+# of counts. This takes a single query.
+def get_workspace_activity(endpoint, workspaces):
+    workspaces = list(workspaces)
+    data = graphql.query(endpoint, SCHEMA, *fetch_workspace_activity(workspaces))
+
+    ret = {}
+    for (i, workspace_id) in enumerate(workspaces):
+        workspace = data.get('workspace%d' % i) or {}
+        ret[workspace_id] = tuple(
+            (workspace.get(connection) or {}).get('totalCount')
+            for connection in ['issueDependencies', 'epics']
+        )
+    return ret
+
+
+# Returns each query that this module sends. Used to prune the generated schema.
+def all_queries():
+    return [
+        WORKSPACE_REPOS_QUERY,
+        WORKSPACE_GRAPH_QUERY,
+        EPICS_QUERY,
+        EPIC_ISSUES_QUERY,
+        fetch_workspace_activity(['workspace'])[0],
+    ]
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+# Prunes an introspected GraphQL schema down to the types and fields reachable from the
+# queries that this project sends, so that `sgqlc-codegen` emits a much smaller module.
+#
+# Usage: prune-schema.py [github|zenhub] SCHEMA_JSON
+#
+# The schema JSON is rewritten in place.
+
+import json
+import sys
+
+from graphql import (
+    TypeInfo,
+    TypeInfoVisitor,
+    Visitor,
+    build_client_schema,
+    get_named_type,
+    is_input_object_type,
+    parse,
+    validate,
+    visit,
+)
+
+from helpers import github, graphql, zenhub
+
+QUERIES = {
+    'github': github.all_queries,
+    'zenhub': zenhub.all_queries,
+}
+
+
+# Records the types and fields used by a query document.
+class UsageVisitor(Visitor):
+    def __init__(self, type_info, types, fields):
+        super().__init__()
+        self.type_info = type_info
+        self.types = types
+        self.fields = fields
+
+    def enter_field(self, node, *args):
+        parent = self.type_info.get_parent_type()
+        field = self.type_info.get_field_def()
+        if parent is None or field is None:
+            return
+        self.types.add(parent.name)
+        self.fields.setdefault(parent.name, set()).add(node.name.value)
+        self.types.add(get_named_type(field.type).name)
+        for arg in field.args.values():
+            self.add_input(get_named_type(arg.type))
+
+    def enter_inline_fragment(self, node, *args):
+        if node.type_condition is not None:
+            self.types.add(node.type_condition.name.value)
+
+    def enter_fragment_definition(self, node, *args):
+        self.types.add(node.type_condition.name.value)
+
+    def enter_variable_definition(self, node, *args):
+        self.add_input(get_named_type(self.type_info.get_input_type()))
+
+    def add_input(self, typ):
+        if typ is None or typ.name in self.types:
+            return
+        self.types.add(typ.name)
+        if is_input_object_type(typ):
+            for field in typ.fields.values():
+                self.add_input(get_named_type(field.type))
+
+
+def prune(introspection, queries):
+    schema = build_client_schema(introspection)
+
+    types = set(['String', 'Int', 'Float', 'Boolean', 'ID'])
+    fields = {}
+    for query in queries:
+        document = parse(query)
+        errors = validate(schema, document, graphql.rules())
+        if errors:
+            raise ValueError('\n'.join(str(e) for e in errors))
+
+        type_info = TypeInfo(schema)
+        visit(document, TypeInfoVisitor(type_info, UsageVisitor(type_info, types, fields)))
+
+    def keep(ref):
+        return ref['name'] in types or ref['name'].startswith('__')
+
+    pruned = []
+    for typ in introspection['__schema']['types']:
+        if not keep(typ):
+            continue
+        typ = dict(typ)
+        if typ['kind'] in ['OBJECT', 'INTERFACE'] and not typ['name'].startswith('__'):
+            typ['fields'] = [f for f in typ['fields'] or [] if f['name'] in fields.get(typ['name'], ())]
+        if typ.get('interfaces') is not None:
+            typ['interfaces'] = [i for i in typ['interfaces'] if keep(i)]
+        if typ.get('possibleTypes') is not None:
+            typ['possibleTypes'] = [t for t in typ['possibleTypes'] if keep(t)]
+        pruned.append(typ)
+
+    # Drop types left without any fields (e.g. interfaces that we only reach through an
+    # implementing type), along with references to them.
+    empty = set(
+        typ['name'] for typ in pruned
+        if typ['kind'] in ['OBJECT', 'INTERFACE'] and not typ['fields']
+    )
+    types -= empty
+    pruned = [typ for typ in pruned if typ['name'] not in empty]
+    for typ in pruned:
+        if typ.get('interfaces') is not None:
+            typ['interfaces'] = [i for i in typ['interfaces'] if keep(i)]
+
+    def named(ref):
+        while ref.get('ofType') is not None:
+            ref = ref['ofType']
+        return ref
+
+    directives = [
+        d for d in introspection['__schema'].get('directives', [])
+        if all(keep(named(arg['type'])) for arg in d['args'])
+    ]
+
+    ret = {'__schema': dict(introspection['__schema'])}
+    ret['__schema']['types'] = pruned
+    ret['__schema']['directives'] = directives
+    ret['__schema']['mutationType'] = None
+    ret['__schema']['subscriptionType'] = None
+
+    # Check that every query is still valid against the pruned schema.
+    schema = build_client_schema(ret)
+    for query in queries:
+        errors = validate(schema, parse(query), graphql.rules())
+        if errors:
+            raise ValueError('\n'.join(str(e) for e in errors))
+
+    return ret
+
+
+def main(api, path):
+    with open(path) as f:
+        data = json.load(f)
+
+    data['data'] = prune(data['data'], QUERIES[api]())
+
+    with open(path, 'w') as f:
+        json.dump(data, f, sort_keys=True, indent=2)
+        f.write('\n')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] in QUERIES:
+        main(sys.argv[1], sys.argv[2])
+    else:
+        print('Usage: %s [%s] SCHEMA_JSON' % (sys.argv[0], '|'.join(QUERIES)))
+        sys.exit(1)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# Syncs the GitHub issues, ZenHub dependency edges and ZenHub epics for every workspace in
+# `zenhub.WORKSPACE_SETS` into the local data store at `DATA_STORE`, so that the report
+# scripts can read them from there instead of fetching them again.
+
+from datetime import datetime, timedelta, timezone
+import json
+import os
+
+from str2bool import str2bool as strtobool
+
+from helpers import epics, github, history, store, zenhub
+from helpers.repos import ALL_REPOS
+
+GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
+ZENHUB_TOKEN = os.environ.get('ZENHUB_TOKEN')
+
+# The labels that scripts look up with `download_issues_with_labels`.
+TRACKED_LABELS = ['C-tracked-bug', 'C-tracked-feature']
+
+# Whether to sync even if the probe finds no changes.
+FORCE_SYNC = strtobool(os.environ.get('FORCE_SYNC', 'false'))
+
+# The maximum age in hours of a sync that we will keep using when the probe finds no
+# changes. The probe can't see every change (e.g. a dependency being replaced by another,
+# or an issue moving between epics), so we periodically sync regardless.
+SYNC_MAX_AGE = float(os.environ.get('SYNC_MAX_AGE', '24'))
+
+# The number of days for which we keep the set of issues changed by each sync. Outputs
+# rendered before then are always rendered again.
+CHANGE_RETENTION = float(os.environ.get('CHANGE_RETENTION', '30'))
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+# Cheaply fingerprints the current state of every repo and workspace that we sync, using
+# one GitHub query and one ZenHub query.
+def probe(gapi, zapi):
+    activity = github.get_repo_activity(gapi, ALL_REPOS)
+    counts = zenhub.get_workspace_activity(zapi, zenhub.WORKSPACE_SETS)
+    return json.dumps({
+        'github': {str(repo.gh_id): updated_at for (repo, updated_at) in activity.items()},
+        'zenhub': {workspace_id: list(c) for (workspace_id, c) in counts.items()},
+    }, sort_keys=True)
+
+
+def is_fresh(db, fingerprint):
+    synced_at = db.data_version()
+    if FORCE_SYNC or synced_at is None or db.get_meta('fingerprint') != fingerprint:
+        return False
+
+    age = datetime.now(timezone.utc) - datetime.strptime(synced_at, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+    return age.total_seconds() < SYNC_MAX_AGE * 3600
+
+
+def main():
+    gapi = github.api(GITHUB_TOKEN)
+    zapi = zenhub.api(ZENHUB_TOKEN)
+    db = store.Store(store.DATA_STORE)
+
+    now = datetime.now(timezone.utc)
+    synced_at = now.strftime(TIMESTAMP_FORMAT)
+
+    print('Probing for changes')
+    fingerprint = probe(gapi, zapi)
+    if is_fresh(db, fingerprint):
+        print('No changes since the last sync at %s' % db.data_version())
+        db.close()
+        return
+
+    db.begin_sync(synced_at)
+    fetcher = github.IssueFetcher(gapi, ALL_REPOS, store.SYNC_FIELDS)
+
+    print('Fetching graphs')
+    for (workspace_id, repos) in zenhub.WORKSPACE_SETS.items():
+        edges = []
+        for page in zenhub.iter_dependency_graph(zapi, workspace_id, repos):
+            edges += page
+            fetcher.submit([n for edge in page for n in edge])
+        db.put_dependency_graph(workspace_id, edges)
+
+    print('Fetching epics')
+    epic_index = epics.EpicIndex(epics.EPIC_INDEX)
+    for (workspace_id, repos) in zenhub.WORKSPACE_SETS.items():
+        workspace_epics = epic_index.refresh(gapi, zapi, workspace_id, repos, ALL_REPOS, store.SYNC_FIELDS)
+        db.put_epics(workspace_id, [(epic_id, (epic.repo, epic.issue_number)) for (epic_id, epic) in workspace_epics])
+        # Epics that we didn't check (because they are known to be closed) have no URL,
+        # so their issue data in the store is kept as is.
+        db.put_issues(epic for (_, epic) in workspace_epics)
+        for (epic_id, epic) in workspace_epics:
+            # Closed epics aren't shown, so we don't need their issues.
+            issues = []
+            if epic.state != 'closed':
+                issues = epic_index.get_epic_issues(zapi, workspace_id, epic_id)
+            db.put_epic_issues(workspace_id, epic_id, issues)
+            fetcher.submit(issues)
+
+    print('Fetching tracked issues')
+    since = db.data_version()
+    if since is None:
+        tracked = github.download_issues_with_labels(gapi, TRACKED_LABELS, ALL_REPOS, store.SYNC_FIELDS)
+        labelled = tracked.keys()
+    else:
+        # Changing an issue's labels updates it, so we only need the tracked issues that
+        # were updated since the last sync, and just the numbers of the others (to find
+        # those that lost their labels). An issue that has a tracked label but isn't in
+        # the store with one (e.g. if TRACKED_LABELS changed) is fetched in full.
+        tracked = github.download_issues_with_labels(
+            gapi, TRACKED_LABELS, ALL_REPOS, store.SYNC_FIELDS, since=since)
+        labelled = github.download_issues_with_labels(gapi, TRACKED_LABELS, ALL_REPOS, github.Projection([]))
+        stored = db.download_issues_with_labels(TRACKED_LABELS, ALL_REPOS)
+        fetcher.submit(n for n in labelled if n not in tracked and n not in stored)
+
+    print('Fetching issues')
+    db.put_issues(fetcher.result().values())
+    db.put_issues(tracked.values())
+    db.remove_labels(TRACKED_LABELS, labelled)
+
+    db.finish_sync(fingerprint, (now - timedelta(days=CHANGE_RETENTION)).strftime(TIMESTAMP_FORMAT))
+
+    if history.HISTORY_STORE:
+        print('Adding to history')
+        log = history.History(history.HISTORY_STORE)
+        log.record(synced_at, db.records())
+        log.close()
+    db.close()
+
+
+if __name__ == '__main__':
+    if not store.DATA_STORE:
+        print('Please set the DATA_STORE environment variable.')
+    elif GITHUB_TOKEN and ZENHUB_TOKEN:
+        main()
+    else:
+        print('Please set the GITHUB_TOKEN and ZENHUB_TOKEN environment variables.')
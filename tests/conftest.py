@@ -0,0 +1,36 @@
+import importlib.util
+import os
+
+import pytest
+
+from helpers import github, repos
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The ZenHub workspace of the core view.
+CORE_WORKSPACE = '5dc1fd615862290001229f21'
+
+
+# Imports the script `name` (whose filename isn't a valid module name).
+def load_script(name):
+    spec = importlib.util.spec_from_file_location(name.replace('-', '_')[:-len('.py')], os.path.join(ROOT, name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope='session')
+def issue_dag():
+    return load_script('zcash-issue-dag.py')
+
+
+# Returns an issue in the form synced by `./sync-store.py`.
+def make_issue(repo, number, state='OPEN', labels=(), milestone=None):
+    return github.GitHubIssue(repo, number, {
+        'state': state,
+        'title': '%s#%d' % ('/'.join(repo.name), number),
+        'url': 'https://github.com/%s/issues/%d' % ('/'.join(repo.name), number),
+        'milestone': {'title': milestone} if milestone is not None else None,
+        'updatedAt': '2025-01-01T00:00:00Z',
+        'labels': {'nodes': [{'name': name} for name in labels]},
+    }, repos.ALL_REPOS)
@@ -0,0 +1,63 @@
+from helpers import github, graphql, repos
+
+ZCASH = repos.ZCASH
+ZIPS = repos.ZIPS
+
+
+# Answers the queries of `fetch_issues_with_labels` from `nodes`, which maps each
+# `(Repo, kind)` to its labelled issues or PRs (most recently updated first), two per page.
+def fake_query(nodes):
+    by_name = {repo.name: repo for (repo, _) in nodes}
+
+    def query(endpoint, schema, query, variables):
+        since = variables.get('since')
+        data = {}
+        for key in variables:
+            if not key.startswith('owner'):
+                continue
+            i = key[len('owner'):]
+            repo = by_name[(variables['owner' + i], variables['name' + i])]
+            repo_data = data['repo%d' % repo.gh_id] = {}
+            for (kind, connection) in [('issues', 'issues'), ('prs', 'pullRequests')]:
+                if kind + i not in variables:
+                    continue
+                found = nodes.get((repo, kind), [])
+                if since is not None and kind == 'issues':
+                    found = [n for n in found if n['updatedAt'] >= since]
+                start = int(variables[kind + i] or 0)
+                repo_data[connection] = {
+                    # Only return the fields that the query selects.
+                    'nodes': [dict((k, v) for (k, v) in n.items() if k in query) for n in found[start:start + 2]],
+                    'pageInfo': {'hasNextPage': start + 2 < len(found), 'endCursor': str(start + 2)},
+                }
+        return data
+    return query
+
+
+def node(number, updated_at):
+    return {'number': number, 'updatedAt': updated_at, 'title': '#%d' % number, 'state': 'OPEN'}
+
+
+NODES = {
+    (ZCASH, 'issues'): [node(5, '2024-03-01'), node(4, '2024-01-01'), node(3, '2023-12-01')],
+    (ZCASH, 'prs'): [node(9, '2024-02-01'), node(8, '2024-01-15'), node(7, '2023-06-01')],
+    (ZIPS, 'issues'): [node(1, '2023-01-01')],
+}
+
+
+def test_download_issues_with_labels(monkeypatch):
+    monkeypatch.setattr(graphql, 'query', fake_query(NODES))
+    projection = github.Projection(['title', 'state', 'updatedAt'])
+
+    issues = github.download_issues_with_labels(None, ['C-tracked-bug'], [ZCASH, ZIPS], projection)
+    assert list(issues) == [(ZCASH, n) for n in [5, 4, 3, 9, 8, 7]] + [(ZIPS, 1)]
+    assert issues[(ZCASH, 5)].title == '#5'
+
+    updated = github.download_issues_with_labels(
+        None, ['C-tracked-bug'], [ZCASH, ZIPS], projection, since='2024-01-10')
+    assert list(updated) == [(ZCASH, 5), (ZCASH, 9), (ZCASH, 8)]
+
+    numbers = github.download_issues_with_labels(
+        None, ['C-tracked-bug'], [ZCASH, ZIPS], github.Projection([]))
+    assert list(numbers) == list(issues)
+    assert numbers[(ZCASH, 5)].title == ''
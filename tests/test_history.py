@@ -0,0 +1,40 @@
+from conftest import CORE_WORKSPACE, make_issue
+from helpers import history, repos, store
+
+ZCASH = repos.ZCASH
+
+
+def test_outputs_from_history_have_their_own_paths(issue_dag, monkeypatch):
+    live = issue_dag.View('core').outputs
+
+    monkeypatch.setattr(history, 'HISTORY_AT', '2024-01-01T12:00:00Z')
+    outputs = issue_dag.View('core').outputs
+    assert 'public/zcash-core-dag-at-2024-01-01T120000Z.svg' in outputs
+    assert not set(outputs) & set(live)
+
+
+def test_rebuilt_store_renders_the_same(issue_dag, tmp_path):
+    db = store.Store(':memory:')
+    log = history.History(str(tmp_path / 'history.sqlite3'))
+
+    db.begin_sync('2024-01-01T00:00:00Z')
+    db.put_issues([make_issue(ZCASH, n) for n in [4, 1, 3, 2]])
+    db.put_dependency_graph(CORE_WORKSPACE, [((ZCASH, 3), (ZCASH, 1)), ((ZCASH, 2), (ZCASH, 1))])
+    db.finish_sync('fingerprint', None)
+    log.record('2024-01-01T00:00:00Z', db.records())
+
+    # Replacing rows moves them to the end of their tables.
+    db.begin_sync('2024-02-01T00:00:00Z')
+    db.put_issues([make_issue(ZCASH, 2, state='CLOSED')])
+    db.put_dependency_graph(CORE_WORKSPACE, [((ZCASH, 4), (ZCASH, 3)), ((ZCASH, 3), (ZCASH, 1)), ((ZCASH, 2), (ZCASH, 1))])
+    db.add_edge(CORE_WORKSPACE, (ZCASH.gh_id, 4), (ZCASH.gh_id, 2))
+    db.finish_sync('fingerprint', None)
+    log.record('2024-02-01T00:00:00Z', db.records())
+
+    rebuilt = log.open_at('2024-02-01T00:00:00Z')
+    assert rebuilt.records() == db.records()
+    assert list(rebuilt.records()) == list(db.records())
+
+    view = issue_dag.View('core', include_finished=True, prune_finished='false', show_epics=False)
+    graphs = [issue_dag.to_agraph(*issue_dag.build(source, view)[:2]).string() for source in [db, rebuilt]]
+    assert graphs[0] == graphs[1]
@@ -0,0 +1,38 @@
+import pygraphviz as pgv
+import pytest
+
+from helpers import layout
+
+
+def clustered_graph():
+    ag = pgv.AGraph(directed=True)
+    ag.add_edges_from([('a', 'b'), ('b', 'c'), ('d', 'c')])
+    ag.add_subgraph(['a', 'b'], name='cluster_0', label='Milestone')
+    return ag
+
+
+def test_fallback_layout_with_clusters(monkeypatch):
+    def timeout(ag, prog, seconds):
+        raise TimeoutError('%s layout took longer than %gs' % (prog, seconds))
+    monkeypatch.setattr(layout, '_run', timeout)
+
+    policy = layout.Policy(timeout=1, fallback='sfdp')
+    (svg, state) = policy.run(clustered_graph())
+    assert svg.startswith('<?xml')
+    assert set(state['nodes']) == {'a', 'b', 'c', 'd'}
+    (label, members, bb) = state['clusters']['cluster_0']
+    assert (label, members) == ('Milestone', ['a', 'b'])
+    assert len(bb) == 4
+
+    # The fallback's layout can be reused.
+    (_, new_state) = layout.stable(clustered_graph(), state, 0.5, policy)
+    assert set(new_state['nodes']) == {'a', 'b', 'c', 'd'}
+
+
+def test_timeout_without_fallback(monkeypatch):
+    def timeout(ag, prog, seconds):
+        raise TimeoutError('%s layout took longer than %gs' % (prog, seconds))
+    monkeypatch.setattr(layout, '_run', timeout)
+
+    with pytest.raises(TimeoutError):
+        layout.Policy(timeout=1).run(clustered_graph())
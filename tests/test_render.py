@@ -0,0 +1,33 @@
+from conftest import CORE_WORKSPACE, make_issue
+from helpers import repos, store
+
+ZCASH = repos.ZCASH
+TFL_BOOK = repos.TFL_REPOS[0]
+
+
+def test_terminate_at_tracks_ancestry_through_other_repos(issue_dag):
+    db = store.Store(':memory:')
+    db.begin_sync('2025-01-01T00:00:00Z')
+    db.put_issues([make_issue(ZCASH, n) for n in [1, 2, 3]] + [make_issue(TFL_BOOK, 5)])
+    # zcash/zcash#2 reaches zcash/zcash#1 only through an issue outside the core view.
+    db.put_dependency_graph(CORE_WORKSPACE, [
+        ((ZCASH, 2), (TFL_BOOK, 5)),
+        ((TFL_BOOK, 5), (ZCASH, 1)),
+    ])
+    db.finish_sync('fingerprint', None)
+
+    view = issue_dag.View('core', terminate_at={'zcash/zcash#1'}, show_epics=False)
+    (dg, _, considered, _) = issue_dag.build(db, view)
+    assert set((n.repo, n.issue_number) for n in dg) == {(ZCASH, 1), (ZCASH, 2)}
+    db.mark_rendered(view.key, considered)
+    assert db.is_rendered(view.key, view.affected_by_repos)
+
+    # A new dependency of the other repo's issue only changes issues in the view's graph
+    # through that issue.
+    db.begin_sync('2025-01-02T00:00:00Z')
+    db.add_edge(CORE_WORKSPACE, (ZCASH.gh_id, 3), (TFL_BOOK.gh_id, 5))
+    db.finish_sync('fingerprint', None)
+    assert not db.is_rendered(view.key, view.affected_by_repos)
+
+    (dg, _, _, _) = issue_dag.build(db, view)
+    assert (ZCASH, 3) in set((n.repo, n.issue_number) for n in dg)
@@ -9,7 +9,7 @@ import re
 from textwrap import wrap
 from urllib.parse import urlparse
 
-from helpers import github, repos as repositories, zenhub
+from helpers import dag, github, history, metrics, repos as repositories, store, zenhub
 
 GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
 ZENHUB_TOKEN = os.environ.get('ZENHUB_TOKEN')
@@ -26,7 +26,10 @@ SWIFT_SDK = (repositories.ZCASH_SWIFT_WALLET_SDK,)
 ZASHI_ANDROID = (repositories.ZASHI_ANDROID,)
 ZASHI_IOS = (repositories.ZASHI_IOS,)
 
-REPOS = github.CORE_REPOS + github.WALLET_REPOS
+REPOS = repositories.RepoSet(github.CORE_REPOS + github.WALLET_REPOS)
+
+# The pipeline reads labels, states, titles and URLs, but never milestones.
+PROJECTION = github.Projection(['state', 'labels', 'title', 'url'])
 
 RELEASE_MATRIX = {
     RUST: [ANDROID_SDK, SWIFT_SDK],
@@ -133,12 +136,21 @@ def build_release_matrix_from(dg, issue, repo_group):
 
     return acc
 
+OUTPUT = history.output_path('public/zashi-pipeline.html')
+
+
 def main():
-    gapi = github.api(GITHUB_TOKEN)
-    zapi = zenhub.api(ZENHUB_TOKEN)
+    data_source = history.open_source(GITHUB_TOKEN, ZENHUB_TOKEN)
+
+    # Skip rendering if nothing has changed since we last rendered the pipeline.
+    if data_source.is_rendered('zashi-pipeline', REPOS) and os.path.exists(OUTPUT):
+        print('Pipeline is up to date')
+        return
 
     print('Fetching tracked issues')
-    tracked_issues = github.download_issues_with_labels(gapi, ['C-tracked-bug', 'C-tracked-feature'], REPOS)
+    metrics.stage('fetch tracked issues')
+    tracked_issues = data_source.download_issues_with_labels(
+        ['C-tracked-bug', 'C-tracked-feature'], REPOS, PROJECTION)
 
     # The repos we care about are now:
     # - Any repo containing a tracked issue.
@@ -158,13 +170,15 @@ def main():
 
     # Build the full dependency graph from ZenHub's per-workspace API.
     print('Fetching graph')
+    metrics.stage('fetch graph')
     dg = nx.compose_all([
-        zenhub.get_dependency_graph(zapi, workspace_id, repos)
+        data_source.get_dependency_graph(workspace_id, repos)
         for (workspace_id, repos) in workspaces.items()
         if len(repos) > 0
     ])
 
     print('Rendering deployment pipeline')
+    metrics.graph('fetched', dg)
 
     # Ensure that the tracked issues all exist in the graph. This is a no-op for
     # issues that are already present.
@@ -174,13 +188,15 @@ def main():
 
     # Replace the graph with the subgraph that only includes the tracked
     # issues and their descendants.
-    descendants = [nx.descendants(dg, n) for n in start_at]
-    dg = nx.subgraph(dg, start_at.union(*descendants))
+    dg = nx.subgraph(dg, dag.descendant_set(dg, start_at))
+    metrics.graph('tracked descendants', dg)
 
     # Fetch the issues within the graph.
-    mapping = github.download_issues(gapi, dg.nodes, repos)
+    metrics.stage('fetch issues')
+    mapping = data_source.download_issues(dg.nodes, repos, PROJECTION)
 
     # Relabel the graph
+    metrics.stage('filter')
     dg = nx.relabel_nodes(dg, mapping)
 
     # Filter out unknown issues
@@ -192,8 +208,10 @@ def main():
     for (source, sink) in dg.edges:
         attrs = dg.edges[source, sink]
         attrs['is_open'] = 0 if source.state == 'closed' else 1
+    metrics.graph('unknown removed', dg)
 
     # Render the HTML version!
+    metrics.stage('render')
     html_header = '''<!DOCTYPE html>
 <html>
   <head>
@@ -266,7 +284,7 @@ def main():
   </body>
 </html>
 '''
-    with open('public/zashi-pipeline.html', 'w') as f:
+    with open(OUTPUT, 'w') as f:
         f.write(html_header)
 
         for issue in tracked_issues.values():
@@ -368,9 +386,15 @@ def main():
 
         f.write(html_footer)
 
+    data_source.mark_rendered('zashi-pipeline')
+
 
 if __name__ == '__main__':
-    if GITHUB_TOKEN and ZENHUB_TOKEN:
+    if history.HISTORY_AT and not history.HISTORY_STORE:
+        print('Please set the HISTORY_STORE environment variable.')
+    elif (GITHUB_TOKEN and ZENHUB_TOKEN) or store.DATA_STORE or history.HISTORY_AT:
+        metrics.start('zashi-pipeline')
         main()
+        metrics.finish()
     else:
-        print('Please set the GITHUB_TOKEN and ZENHUB_TOKEN environment variables.')
+        print('Please set the GITHUB_TOKEN and ZENHUB_TOKEN (or DATA_STORE) environment variables.')
@@ -6,29 +6,27 @@
 
 import networkx as nx
 
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import hashlib
+import io
+import json
 from str2bool import str2bool as strtobool
 import os
+import queue
+import threading
+import time
 from textwrap import wrap
-from urllib.parse import urlparse
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape, quoteattr
 
-from helpers import github, zenhub
+from helpers import dag, events, github, history, layout, metrics, stages, store, zenhub
 
 GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
 ZENHUB_TOKEN = os.environ.get('ZENHUB_TOKEN')
 
 DAG_VIEW = os.environ.get('DAG_VIEW', 'core')
 
-REPOS = github.REPO_SETS[DAG_VIEW]
-
-WORKSPACES = {
-    workspace_id: repos
-    for (workspace_id, repos) in {
-        workspace_id: [repo for repo in repos if repo in REPOS]
-        for (workspace_id, repos) in zenhub.WORKSPACE_SETS.items()
-    }.items()
-    if len(repos) > 0
-}
-
 SUPPORTED_CATEGORIES = set(['releases', 'targets'])
 def cats(s):
     return set([x.strip() for x in s.split(',')]) - set([''])
@@ -56,93 +54,456 @@ SHOW_MILESTONES = strtobool(os.environ.get('SHOW_MILESTONES', 'false'))
 # Whether to group issues and PRs by ZenHub epics.
 SHOW_EPICS = strtobool(os.environ.get('SHOW_EPICS', 'false'))
 
+# Whether to highlight the open issues on the critical path to an open target or release
+# issue (those that would delay it if they took any longer).
+SHOW_CRITICAL_PATH = strtobool(os.environ.get('SHOW_CRITICAL_PATH', 'false'))
+
+# If set, a directory in which to cache the outputs of the expensive stages of rendering a
+# view: a snapshot of the view's data (its dependency graph, epics and issues), and the
+# layout of the rendered graph. Re-running a view with different filtering options then
+# reuses its snapshot instead of fetching again.
+STAGE_CACHE = os.environ.get('STAGE_CACHE') or None
+
+# The maximum age in minutes of a cached snapshot of the remote APIs. Snapshots of a data
+# store are reused until the store is next synced.
+STAGE_CACHE_MAX_AGE = float(os.environ.get('STAGE_CACHE_MAX_AGE', '60'))
+
+# If set, a directory in which to keep the layout of each view (and set of options), so
+# that the next render of it keeps the issues that haven't changed where they were, and
+# only lays out the parts of the graph that changed.
+LAYOUT_STATE = os.environ.get('LAYOUT_STATE') or None
+
+# The fraction of a view's issues that can change before it is laid out from scratch.
+LAYOUT_CHANGE_THRESHOLD = float(os.environ.get('LAYOUT_CHANGE_THRESHOLD', '0.2'))
+
+# The number of nodes and edges in total beyond which a graph is laid out with faster (but
+# lower quality) `dot` settings.
+LAYOUT_LARGE_GRAPH = int(os.environ.get('LAYOUT_LARGE_GRAPH', '2000'))
+
+# The maximum number of seconds to spend laying out a graph with `dot`, after which it is
+# laid out with the LAYOUT_FALLBACK engine instead (without a limit). Set to 0 to lay out
+# without a limit.
+LAYOUT_TIMEOUT = float(os.environ.get('LAYOUT_TIMEOUT', '300'))
+
+# The Graphviz engine to lay out a graph with when `dot` takes too long. Set to an empty
+# string to skip the SVG and HTML outputs instead (the analytics and exports are still
+# written).
+LAYOUT_FALLBACK = os.environ.get('LAYOUT_FALLBACK', 'sfdp')
+
+LAYOUT_POLICY = layout.Policy(LAYOUT_LARGE_GRAPH, LAYOUT_TIMEOUT, LAYOUT_FALLBACK)
+
+# The formats in which to also export each view's graph, for consumers that need its data
+# rather than a picture: `jsonl` (JSON Lines) and `graphml`. Exporting doesn't need
+# Graphviz.
+#
+# Format is FORMAT[,FORMAT[, ..]]
+EXPORT_FORMATS = cats(os.environ.get('EXPORT_FORMATS', ''))
+
+# Whether to skip laying out the graph, and so not write the SVG and HTML outputs. The
+# analytics and exports are still written.
+SKIP_LAYOUT = strtobool(os.environ.get('SKIP_LAYOUT', 'false'))
+
+# If set, runs as a service that keeps the data store in memory, applies the events read
+# from this feed to it, and re-renders the views that they affect. See `helpers/events.py`
+# for the feed format.
+#
+# Format is PATH (a file, which is followed as it grows, or a named pipe), `-` (stdin),
+# or `unix:PATH` (a Unix socket to listen on).
+EVENT_FEED = os.environ.get('EVENT_FEED')
+
+# The views that the service renders, all with the options above.
+#
+# Format is DAG_VIEW[,DAG_VIEW[, ..]]
+DAG_VIEWS = [x.strip() for x in os.environ.get('DAG_VIEWS', DAG_VIEW).split(',') if x.strip()]
+
+# The service waits until no events have arrived for this many seconds before rendering,
+# so that a burst of events (e.g. several labels being changed) renders once.
+EVENT_DEBOUNCE = float(os.environ.get('EVENT_DEBOUNCE', '5'))
+
+# The maximum number of seconds that the service delays rendering while events continue
+# to arrive.
+EVENT_MAX_DELAY = float(os.environ.get('EVENT_MAX_DELAY', '60'))
+
+# How often in seconds the service checks whether the data store at DATA_STORE has been
+# synced while no events are arriving. It also checks before applying each batch.
+EVENT_STORE_POLL = float(os.environ.get('EVENT_STORE_POLL', '60'))
+
+
+# If set, runs an HTTP server on [HOST:]PORT that renders any view with any options on
+# request, from an in-memory copy of the data store at DATA_STORE. Requests have the form
+# `/DAG_VIEW.[svg|html|json|jsonl|graphml]?OPTION=VALUE&..`, where the options are those
+# above.
+VIEW_SERVER = os.environ.get('VIEW_SERVER')
+
+# The maximum total size in bytes of the rendered views that the server caches.
+VIEW_CACHE_SIZE = int(os.environ.get('VIEW_CACHE_SIZE', str(64 * 1024 * 1024)))
+
+
+# A view of the DAG, along with the options it is rendered with. The options default to
+# the environment variables above.
+class View:
+    def __init__(
+        self,
+        name,
+        terminate_at=TERMINATE_AT,
+        only_include=ONLY_INCLUDE,
+        include_finished=INCLUDE_FINISHED,
+        prune_finished=PRUNE_FINISHED,
+        show_milestones=SHOW_MILESTONES,
+        show_epics=SHOW_EPICS,
+        show_critical_path=SHOW_CRITICAL_PATH,
+    ):
+        self.name = name
+        self.terminate_at = terminate_at
+        self.only_include = only_include
+        self.include_finished = include_finished
+        self.prune_finished = prune_finished
+        self.show_milestones = show_milestones
+        self.show_epics = show_epics
+        self.show_critical_path = show_critical_path
+
+        self.repos = github.REPO_SETS[name]
+
+        # Look up the repo IDs for the given terminating issues.
+        self.terminate_nodes = set()
+        for x in terminate_at:
+            try:
+                (r, i) = x.split('#')
+                self.terminate_nodes.add((self.repos.by_name[tuple(r.split('/', 1))], int(i)))
+            except (KeyError, ValueError):
+                raise ValueError('TERMINATE_AT issue %s is not in DAG_VIEW="%s"' % (x, name))
+        self.workspaces = {
+            workspace_id: repos
+            for (workspace_id, repos) in {
+                workspace_id: [repo for repo in repos if repo in self.repos]
+                for (workspace_id, repos) in zenhub.WORKSPACE_SETS.items()
+            }.items()
+            if len(repos) > 0
+        }
+
+        # Identifies the output of this view and set of options.
+        self.key = '%s?%s' % (name, '&'.join('%s=%s' % kv for kv in [
+            ('TERMINATE_AT', ','.join(sorted(terminate_at))),
+            ('ONLY_INCLUDE', ','.join(sorted(only_include))),
+            ('INCLUDE_FINISHED', include_finished),
+            ('PRUNE_FINISHED', prune_finished),
+            ('SHOW_MILESTONES', show_milestones),
+            ('SHOW_EPICS', show_epics),
+            ('SHOW_CRITICAL_PATH', show_critical_path),
+        ]))
+
+        # The repos whose changed issues could newly appear in this view. When
+        # TERMINATE_AT is set, an issue can only newly appear by gaining a dependency path
+        # to an issue that the view already considered, and adding that edge changes the
+        # issue at its other end.
+        self.affected_by_repos = self.repos if len(terminate_at) == 0 else []
+
+        self.outputs = ([] if SKIP_LAYOUT else [self.output('.svg'), self.output('.html')]) + [
+            self.output('-analytics.json'),
+        ] + [self.output('.%s' % fmt) for fmt in sorted(EXPORT_FORMATS)]
+
+    def __repr__(self):
+        return self.key
+
+    def output(self, suffix):
+        return history.output_path('public/zcash-%s-dag%s' % (self.name, suffix))
+
 
 def main():
-    gapi = github.api(GITHUB_TOKEN)
-    zapi = zenhub.api(ZENHUB_TOKEN)
+    data_source = history.open_source(GITHUB_TOKEN, ZENHUB_TOKEN)
+    render(data_source, View(DAG_VIEW))
+
+
+# Returns an in-memory copy of the data store at DATA_STORE.
+def load_store():
+    db = store.Store(':memory:')
+    disk = store.Store(store.DATA_STORE)
+    disk.db.backup(db.db)
+    disk.close()
+    return db
+
+
+# Keeps a copy of the data store in memory, and re-renders the views in DAG_VIEWS that are
+# affected by each batch of events read from EVENT_FEED. The copy is reloaded whenever the
+# data store is synced.
+def serve():
+    disk = store.Store(store.DATA_STORE)
+    if disk.data_version() is None:
+        print('Error: the data store at DATA_STORE has not been synced')
+        return
+
+    views = [View(name) for name in DAG_VIEWS]
+
+    feed = queue.Queue()
+    threading.Thread(target=events.read_feed, args=(EVENT_FEED, feed), daemon=True).start()
+
+    db = None
+    event = False
+    while event is not None:
+        if db is not None:
+            try:
+                event = feed.get(timeout=EVENT_STORE_POLL)
+            except queue.Empty:
+                event = False
+            if event is None:
+                break
+
+        if db is None or disk.data_version() != base_version:
+            # The sync replaces the events that we applied before it.
+            db = load_store()
+            base_version = db.data_version()
+            print('Loaded data version %s' % base_version)
+            for view in views:
+                render(db, view)
+            # Each batch of events becomes a new data version, which sorts after the
+            # version we loaded and before that of the next sync.
+            batch = 0
+        if event is False:
+            continue
+
+        batch += 1
+        db.begin_sync('%s+%06d' % (base_version, batch))
+
+        count = 0
+        deadline = time.monotonic() + EVENT_MAX_DELAY
+        while True:
+            try:
+                if events.apply(db, event):
+                    count += 1
+                else:
+                    print('Ignoring unsupported event: %s' % event.get('event'))
+            except (KeyError, TypeError, AttributeError) as e:
+                print('Ignoring malformed %s event: %r' % (event.get('event'), e))
+
+            # `False` means that we have stopped waiting, and `None` that the feed ended.
+            timeout = min(EVENT_DEBOUNCE, deadline - time.monotonic())
+            if timeout <= 0:
+                event = False
+                break
+            try:
+                event = feed.get(timeout=timeout)
+            except queue.Empty:
+                event = False
+                break
+            if event is None:
+                break
+
+        db.finish_sync(db.get_meta('fingerprint'), None)
+        print('Applied %d events' % count)
+        for view in views:
+            render(db, view)
+
+    disk.close()
+
+
+def render(data_source, view):
+    if len(view.workspaces) == 0:
+        print('Error: DAG_VIEW="{}" has no matching ZenHub workspaces'.format(view.name))
+        return
 
-    if len(WORKSPACES) == 0:
-        print('Error: DAG_VIEW="{}" has no matching ZenHub workspaces'.format(DAG_VIEW))
+    # Skip rendering if nothing has changed since we last rendered this view.
+    if (
+        data_source.is_rendered(view.key, view.affected_by_repos, view.outputs)
+        and all(os.path.exists(f) for f in view.outputs)
+    ):
+        print('DAG is up to date')
         return
 
+    cache = stages.StageCache(STAGE_CACHE)
+    if STAGE_CACHE:
+        metrics.stage('snapshot', view=view.name)
+        # Build the view from a snapshot of its data, which doesn't depend on the options
+        # that only filter or style the graph.
+        version = data_source.data_version()
+        build_source = cache.run(
+            'snapshot',
+            (view.name, view.show_epics, version),
+            lambda: store.Snapshot(data_source, view.workspaces, view.repos, view.show_epics),
+            max_age=None if version is not None else STAGE_CACHE_MAX_AGE * 60,
+        )
+    else:
+        build_source = data_source
+
+    (dg, clusters, considered, report) = build(build_source, view)
+    os.makedirs('public', exist_ok=True)
+
+    if EXPORT_FORMATS:
+        metrics.stage('export', view=view.name)
+        for fmt in sorted(EXPORT_FORMATS):
+            with open(view.output('.%s' % fmt), 'w') as f:
+                EXPORTERS[fmt](f, view, dg, clusters, data_source.data_version())
+
+    svg_data = None
+    if not SKIP_LAYOUT:
+        # Draw the result!
+        metrics.stage('layout', view=view.name)
+        try:
+            svg_data = lay_out(cache, view, to_agraph(dg, clusters))
+        except TimeoutError as e:
+            print('Warning: not writing the SVG and HTML outputs: %s' % e)
+
+    if svg_data is not None:
+        metrics.stage('write', view=view.name)
+        with open(view.output('.svg'), 'w') as f:
+            f.write(svg_data)
+
+        # Render the HTML version!
+        with open(view.output('.html'), 'w') as f:
+            f.write(to_html(view, svg_data))
+
+    with open(view.output('-analytics.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+
+    # If we couldn't lay out the view, render it again next time.
+    if SKIP_LAYOUT or svg_data is not None:
+        data_source.mark_rendered(view.key, considered, view.outputs)
+
+
+# Lays out `ag`, the graph of `view`. Returns the SVG.
+def lay_out(cache, view, ag):
+    if not LAYOUT_STATE:
+        return cache.run('layout', ag.string(), lambda: to_svg(ag))
+
+    state_path = os.path.join(LAYOUT_STATE, '%s-%s.json' % (
+        view.name,
+        hashlib.sha256(view.key.encode()).hexdigest()[:16],
+    ))
+    previous = layout.load_state(state_path)
+    (svg_data, state) = cache.run(
+        'layout',
+        (ag.string(), json.dumps(previous, sort_keys=True)),
+        lambda: layout.stable(ag, previous, LAYOUT_CHANGE_THRESHOLD, LAYOUT_POLICY),
+    )
+    layout.save_state(state_path, state)
+    return svg_data
+
+
+# The reachability indexes of recently-built views, which the long-running modes update
+# incrementally while a view's graph only gains edges.
+REACHABILITY_CACHE_SIZE = 16
+_reachability = OrderedDict()
+
+
+def reachability(view, dg):
+    reach = _reachability.pop(view.key, None)
+    if reach is None or not reach.update(dg):
+        reach = dag.Reachability(dg)
+    _reachability[view.key] = reach
+    while len(_reachability) > REACHABILITY_CACHE_SIZE:
+        _reachability.popitem(last=False)
+    return reach
+
+
+# Builds the styled graph for `view`. Returns the graph, its clusters as a list of
+# `(label, nodes)`, the `(repo, issue)` pairs that the view considered, and the report
+# from `analyse`.
+def build(data_source, view):
+    # We only fetch the issue fields necessary for pruning up front; the fields used for
+    # rendering are fetched once we know which issues remain.
+    (state, details) = github.plan_projections(
+        prune_labels=(
+            (len(view.only_include) > 0 and view.only_include.issubset(SUPPORTED_CATEGORIES)) or
+            (len(cats(view.prune_finished)) > 0 and cats(view.prune_finished).issubset(SUPPORTED_CATEGORIES))
+        ),
+        show_milestones=view.show_milestones,
+    )
+    fetcher = data_source.issue_fetcher(view.repos, state)
+
+    # Unless we are going to cut the graph down to the ancestors of TERMINATE_AT, every
+    # issue in it will be needed, so we fetch issues while ZenHub is still paginating.
+    prefetch = len(view.terminate_at) == 0
+
     # Build the full dependency graph from ZenHub's per-workspace API.
     print('Fetching graph')
-    dg = nx.compose_all([
-        zenhub.get_dependency_graph(zapi, workspace_id, repos)
-        for (workspace_id, repos) in WORKSPACES.items()
-    ])
+    metrics.stage('fetch graph', view=view.name)
+    dg = nx.DiGraph()
+    for (workspace_id, repos) in view.workspaces.items():
+        for edges in data_source.iter_dependency_graph(workspace_id, repos):
+            dg.add_edges_from(edges)
+            if prefetch:
+                fetcher.submit([n for edge in edges for n in edge])
 
     print('Rendering DAG')
-
-    if SHOW_EPICS:
-        epics_issues = []
-        for (workspace_id, repos) in WORKSPACES.items():
-            epics_issues += zenhub.get_epics(zapi, workspace_id, repos)
-        epics_issues = set(epics_issues)
-
-        epics_mapping = github.download_issues(gapi, [gh_ref for (_, gh_ref) in epics_issues], REPOS)
-        epics_mapping = {k: v for (k, v) in epics_mapping.items() if v.state != 'closed'}
+    metrics.graph('fetched', dg, view=view.name)
+
+    if view.show_epics:
+        metrics.stage('fetch epics', view=view.name)
+        # Index each epic's issue by the workspace and ZenHub ID of the epic, and only
+        # keep the open epics.
+        epic_refs = {}
+        epics_mapping = {}
+        for (workspace_id, repos) in view.workspaces.items():
+            for (epic_id, epic) in data_source.get_epic_index(workspace_id, repos, view.repos):
+                gh_ref = (epic.repo, epic.issue_number)
+                if gh_ref not in epic_refs:
+                    epic_refs[gh_ref] = (workspace_id, epic_id)
+                    if epic.state != 'closed':
+                        epics_mapping[gh_ref] = epic
         issues_by_epic = {}
-        for (i, ((repo, epic_id), epic)) in enumerate(epics_mapping.items()):
-            workspace_id = [
-                workspace_id
-                for (workspace_id, repos) in WORKSPACES.items()
-                if repo in repos
-            ][0]
-            epic_id = [
-                id for (id, gh_ref) in epics_issues
-                if gh_ref == (repo, epic_id)
-            ][0]
-            issues = set(zenhub.get_epic_issues(zapi, workspace_id, epic_id))
+        for (gh_ref, epic) in epics_mapping.items():
+            (workspace_id, epic_id) = epic_refs[gh_ref]
+            issues = set(data_source.get_epic_issues(workspace_id, epic_id))
             issues_by_epic[epic] = issues
-            for i in issues:
-                # zapi.dependencies only returns nodes that have some connection,
-                # but we'd like to show all issues from epics even if they are
-                # disconnected.
-                dg.add_node(i)
-
-    if len(TERMINATE_AT) > 0:
-        # Look up the repo IDs for the given terminating issues.
-        reverse_repos = {repo.name: repo for repo in REPOS}
-        terminate_at = [x.split('#') for x in TERMINATE_AT]
-        terminate_at = set([(reverse_repos[tuple(r.split('/', 1))], int(i)) for (r, i) in terminate_at])
+            # zapi.dependencies only returns nodes that have some connection, but we'd
+            # like to show all issues from epics even if they are disconnected.
+            dg.add_nodes_from(issues)
+            if prefetch:
+                fetcher.submit(issues)
 
+    if len(view.terminate_at) > 0:
         # Replace the graph with the subgraph that only includes the terminating
         # issues and their ancestors.
-        ancestors = [nx.ancestors(dg, n) for n in terminate_at]
-        dg = nx.subgraph(dg, terminate_at.union(*ancestors))
+        dg = dag.ancestor_subgraph(dg, view.terminate_nodes)
+        metrics.graph('TERMINATE_AT', dg, view=view.name)
+
+    # The issues that this view considered, any of which could be rendered if it changes.
+    # This includes issues in other repos, because a TERMINATE_AT view can reach its
+    # terminating issues through them (so an edge added to one could add issues to it).
+    considered = list(dg.nodes)
+    if view.show_epics:
+        considered += list(epic_refs)
+
+    # Fetch the issues within the graph that weren't already fetched.
+    metrics.stage('fetch issues', view=view.name)
+    fetcher.submit(dg.nodes)
+    mapping = fetcher.result()
 
-    # Fetch the issues within the graph.
-    mapping = github.download_issues(gapi, dg.nodes, REPOS)
+    metrics.stage('filter', view=view.name)
+    # Index which issues in this view's repos can reach each other, for the filters below.
+    reach = reachability(view, dg.subgraph([n for n in dg if n[0] in view.repos]))
 
     # Relabel the graph
     dg = nx.relabel_nodes(dg, mapping)
+    reach = reach.relabel(mapping)
 
     # Filter out unknown issues
-    unknown = [n for n in dg if n.repo not in REPOS]
+    unknown = [n for n in dg if n.repo not in view.repos]
     if len(unknown) > 0:
         dg.remove_nodes_from(unknown)
+    metrics.graph('unknown removed', dg, view=view.name)
 
     # Apply property annotations
     for (source, sink) in dg.edges:
         attrs = dg.edges[source, sink]
         attrs['is_open'] = 0 if source.state == 'closed' else 1
 
-    if len(ONLY_INCLUDE) > 0 and ONLY_INCLUDE.issubset(SUPPORTED_CATEGORIES):
-        # Insert direct edges for all transitive paths in the graph. This creates edges
-        # between target issues that were not previously directly connected, but were
-        # "reachable".
-        tc = nx.transitive_closure_dag(dg)
-
-        # Remove non-target issues. This also removes their involved edges, leaving behind
-        # the transitive closure of the target issues.
-        tc.remove_nodes_from([n for n in dg.nodes if not n.any_cat(ONLY_INCLUDE)])
+    if len(view.only_include) > 0 and view.only_include.issubset(SUPPORTED_CATEGORIES):
+        # Connect each pair of target issues where one is reachable from the other. This
+        # creates edges between target issues that were not previously directly connected,
+        # but were "reachable", leaving behind the transitive closure of the target issues.
+        targets = [n for n in dg.nodes if n.any_cat(view.only_include)]
+        within = reach.bits(targets)
+        tc = nx.DiGraph()
+        tc.add_nodes_from(targets)
+        tc.add_edges_from((n, d) for n in targets for d in reach.descendants(n, within))
 
         # Reduce to the minimum number of edges representing the same transitive paths.
         # This is unique for a DAG.
         dg = nx.transitive_reduction(tc)
+        metrics.graph('ONLY_INCLUDE', dg, view=view.name)
 
-    if not INCLUDE_FINISHED:
+    if not view.include_finished:
         # Identify the disconnected subgraphs.
         subgraphs = [dg.subgraph(c) for c in nx.connected_components(dg.to_undirected())]
 
@@ -152,28 +513,40 @@ def main():
         # Remove fully-closed subgraphs.
         if len(ignore) > 0:
             dg.remove_nodes_from(nx.compose_all(ignore))
+        metrics.graph('INCLUDE_FINISHED', dg, view=view.name)
 
     # Prune nodes that are not downstream of any open issues.
-    if cats(PRUNE_FINISHED).issubset(SUPPORTED_CATEGORIES):
-        closed_targets = [n for n in dg.nodes if n.any_cat(cats(PRUNE_FINISHED)) and n.state == 'closed']
+    if cats(view.prune_finished).issubset(SUPPORTED_CATEGORIES):
+        closed_targets = [n for n in dg.nodes if n.any_cat(cats(view.prune_finished)) and n.state == 'closed']
+        remaining = reach.bits(dg)
         for target in closed_targets:
             # Check that the target (and by extension its ancestors) wasn't already
             # removed for being the ancestor of another closed target.
             if target in dg:
-                ancestors = nx.ancestors(dg, target)
+                # The ancestors that remain in the graph are exactly its ancestors there,
+                # because removed nodes only ever take all of their ancestors with them.
+                ancestors = reach.ancestors(target, remaining)
                 if all(n.state == 'closed' for n in ancestors):
                     # Only prune ancestors, not the closed target node, so that
                     # we see the most recently-closed target nodes in the DAG.
                     dg.remove_nodes_from(ancestors)
+                    remaining &= ~reach.bits(ancestors)
+        metrics.graph('PRUNE_FINISHED', dg, view=view.name)
 
-    elif PRUNE_FINISHED in ['true', 'all']:
+    elif view.prune_finished in ['true', 'all']:
         # - It would be nice to keep the most recently-closed issues on the DAG, but
         #   dg.out_degree seems to be broken...
         to_prune = [n for (n, degree) in dg.in_degree() if degree == 0 and n.state == 'closed']
         while len(to_prune) > 0:
             dg.remove_nodes_from(to_prune)
             to_prune = [n for (n, degree) in dg.in_degree() if degree == 0 and n.state == 'closed']
+        metrics.graph('PRUNE_FINISHED', dg, view=view.name)
+
+    # Fetch the remaining fields for the issues that will be rendered.
+    metrics.stage('fetch details', view=view.name)
+    data_source.download_issue_details(dg.nodes, details)
 
+    metrics.stage('style', view=view.name)
     do_next = [n for (n, degree) in dg.in_degree(weight='is_open') if degree == 0 and n.state != 'closed']
 
     # Apply style annotations.
@@ -205,39 +578,132 @@ def main():
             attrs['URL'] = n.url
             attrs['target'] = '_blank'
 
-    ag = nx.nx_agraph.to_agraph(dg)
+    metrics.stage('analyse', view=view.name)
+    report = analyse(view, dg, reach)
+
+    if view.show_critical_path:
+        for n in dg:
+            attrs = dg.nodes[n]
+            if n.state != 'closed' and attrs.get('slack') == 0:
+                attrs['class'] += ' critical'
+                attrs['color'] = '#d73a49'
+
+    metrics.stage('cluster', view=view.name)
+    clusters = cluster(
+        dg,
+        view.show_milestones,
+        issues_by_epic if view.show_epics else {},
+    )
+    metrics.graph('rendered', dg, view=view.name)
+
+    return (dg, clusters, considered, report)
+
+
+# Groups the nodes of `dg` into clusters, as a list of `(label, nodes)`: one for each
+# milestone if `show_milestones` is set, followed by one for each epic in
+# `issues_by_epic` (a dict mapping each epic to the `(repo, issue)` pairs within it).
+# Clusters without any nodes are omitted.
+def cluster(dg, show_milestones, issues_by_epic):
+    # Invert the epics, so that we can assign every node to its clusters in one pass.
+    epics_by_issue = {}
+    for (epic, issues) in issues_by_epic.items():
+        for gh_ref in issues:
+            epics_by_issue.setdefault(gh_ref, []).append(epic)
+
+    milestones = {}
+    epics = {epic: [] for epic in issues_by_epic}
+    for n in dg:
+        if show_milestones and n.milestone is not None:
+            milestones.setdefault(n.milestone, []).append(n)
+        for epic in epics_by_issue.get((n.repo, n.issue_number), []):
+            epics[epic].append(n)
+
+    return list(milestones.items()) + [
+        (epic.title, nodes) for (epic, nodes) in epics.items() if nodes
+    ]
+
+
+def issue_id(n):
+    return '%s#%d' % ('/'.join(n.repo.name), n.issue_number)
 
-    clusters = 0
-    if SHOW_MILESTONES:
-        # Identify milestone nbunches
-        milestones = {n.milestone: [] for n in dg}
-        for m in milestones:
-            milestones[m] = [n for n in dg if n.milestone == m]
-        if None in milestones:
-            del milestones[None]
-        for (milestone, nodes) in milestones.items():
-            ag.add_subgraph(nodes, 'cluster_%d' % clusters, label=milestone, color='blue')
-            clusters += 1
-
-    if SHOW_EPICS:
-        for (epic, issues) in issues_by_epic.items():
-            issues = [n for n in dg if (n.repo, n.issue_number) in issues]
-            if issues:
-                ag.add_subgraph(issues, 'cluster_%d' % clusters, label=epic.title, color='blue')
-                clusters += 1
-
-    # Draw the result!
+
+# Finds the longest chain of open issues leading to each open target or release issue, how
+# far each issue can slip before it lengthens one of those chains, and how many open
+# targets and releases each open issue blocks. Sets these as the `chain`, `slack` and
+# `blocks` attributes of each node, and returns them as a report.
+def analyse(view, dg, reach):
+    def is_open(n):
+        return n.state != 'closed'
+
+    targets = set(n for n in dg if is_open(n) and (n.is_target or n.is_release))
+    try:
+        (length, slack, prev) = dag.critical_paths(dg, lambda n: 1 if is_open(n) else 0, targets)
+    except nx.NetworkXUnfeasible:
+        print('Warning: the graph contains a cycle, so critical paths are not available')
+        return {'view': view.key, 'targets': [], 'blockers': []}
+
+    # Every node that we removed from the graph took all of its ancestors with it, so the
+    # index's descendants that remain in the graph are exactly the descendants there.
+    within = reach.bits(targets)
+    blocks = {n: reach.descendant_count(n, within) for n in dg if is_open(n)}
+
+    for n in dg:
+        attrs = dg.nodes[n]
+        attrs['chain'] = length[n]
+        if slack[n] is not None:
+            attrs['slack'] = slack[n]
+        if n in blocks:
+            attrs['blocks'] = blocks[n]
+
+    return {
+        'view': view.key,
+        'targets': [
+            {
+                'issue': issue_id(t),
+                'title': t.title,
+                'url': t.url,
+                'chain': length[t],
+                'critical_path': [issue_id(n) for n in dag.critical_path(prev, t) if is_open(n)],
+            }
+            for t in sorted(targets, key=lambda t: (-length[t], issue_id(t)))
+        ],
+        'blockers': [
+            {
+                'issue': issue_id(n),
+                'title': n.title,
+                'url': n.url,
+                'blocks': blocks[n],
+                'chain': length[n],
+                'slack': slack[n],
+            }
+            for n in sorted(
+                [n for n in blocks if blocks[n] > 0],
+                key=lambda n: (-blocks[n], slack[n], issue_id(n)),
+            )
+        ],
+    }
+
+
+def to_agraph(dg, clusters):
+    ag = nx.nx_agraph.to_agraph(dg)
+    for (i, (label, nodes)) in enumerate(clusters):
+        # `ag.add_subgraph(nodes)` would scan every edge of the graph for each cluster,
+        # so we add the cluster's own edges instead.
+        subgraph = ag.add_subgraph(None, 'cluster_%d' % i, label=label, color='blue')
+        subgraph.add_nodes_from(str(n) for n in nodes)
+        subgraph.add_edges_from((str(u), str(v)) for (u, v) in dg.subgraph(nodes).edges)
     ag.graph_attr['rankdir'] = 'LR'
     ag.graph_attr['stylesheet'] = 'zcash-dag.css'
-    ag.layout(prog='dot')
-    os.makedirs('public', exist_ok=True)
-    ag.draw('public/zcash-%s-dag.svg' % DAG_VIEW)
+    return ag
+
 
-    # Render the HTML version!
-    with open('public/zcash-%s-dag.svg' % DAG_VIEW) as f:
-        svg_data = f.read()
+def to_svg(ag):
+    return layout.full(ag, LAYOUT_POLICY)[0]
+
+
+def to_html(view, svg_data):
     svg_start = svg_data.find('<svg')
-    html_data = '''<!DOCTYPE html>
+    return '''<!DOCTYPE html>
 <html>
   <head>
     <title>Zcash %s DAG</title>
@@ -265,13 +731,290 @@ def main():
     </script>
   </body>
 </html>
-''' % (DAG_VIEW, svg_data[svg_start:])
-    with open('public/zcash-%s-dag.html' % DAG_VIEW, 'w') as f:
-        f.write(html_data)
+''' % (view.name, svg_data[svg_start:])
+
+# A least-recently-used cache of rendered views, bounded by their total size in bytes.
+class RenderCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = value
+        self.size += len(value)
+        while self.size > self.max_size and len(self.entries) > 1:
+            (_, evicted) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+# Parses the options of a view server request. Options that aren't given take their
+# default values, rather than those of the server's environment.
+def parse_view(name, query):
+    options = {key: values[-1] for (key, values) in parse_qs(query).items()}
+    unknown = set(options) - set([
+        'TERMINATE_AT', 'ONLY_INCLUDE', 'INCLUDE_FINISHED', 'PRUNE_FINISHED',
+        'SHOW_MILESTONES', 'SHOW_EPICS', 'SHOW_CRITICAL_PATH',
+    ])
+    if unknown:
+        raise ValueError('Unknown options: %s' % ', '.join(sorted(unknown)))
+
+    def flag(key):
+        value = strtobool(options.get(key, 'false'))
+        if value is None:
+            raise ValueError('%s must be true or false' % key)
+        return value
+
+    return View(
+        name,
+        terminate_at=cats(options.get('TERMINATE_AT', '')),
+        only_include=cats(options.get('ONLY_INCLUDE', '')),
+        include_finished=flag('INCLUDE_FINISHED'),
+        prune_finished=options.get('PRUNE_FINISHED', 'true'),
+        show_milestones=flag('SHOW_MILESTONES'),
+        show_epics=flag('SHOW_EPICS'),
+        show_critical_path=flag('SHOW_CRITICAL_PATH'),
+    )
+
+
+# Returns the data of node `n` in the graph `dg` built by `build`.
+def node_data(dg, n):
+    attrs = dg.nodes[n]
+    return {
+        'id': issue_id(n),
+        'title': n.title,
+        'url': n.url,
+        'state': n.state,
+        'is_pr': n.is_pr,
+        'labels': n.labels,
+        'milestone': n.milestone,
+        'class': attrs['class'],
+        'do_next': attrs['penwidth'] == 2,
+        'chain': attrs.get('chain'),
+        'slack': attrs.get('slack'),
+        'blocks': attrs.get('blocks'),
+    }
+
+
+# Returns the data of the edge from `source` to `sink`. (The edges left by ONLY_INCLUDE
+# don't have an `is_open` attribute, so we derive it here.)
+def edge_data(source, sink):
+    return {
+        'source': issue_id(source),
+        'target': issue_id(sink),
+        'is_open': source.state != 'closed',
+    }
+
+
+def to_json(view, dg, clusters, report, version=None):
+    return json.dumps({
+        'view': view.key,
+        'version': version,
+        'nodes': [node_data(dg, n) for n in dg],
+        'edges': [edge_data(source, sink) for (source, sink) in dg.edges],
+        'clusters': [
+            {'label': label, 'nodes': [issue_id(n) for n in nodes]}
+            for (label, nodes) in clusters
+        ],
+        'analytics': report,
+    }, indent=2)
+
+
+# Writes the graph to `f` as JSON Lines: a `view` record, followed by a record for each
+# node, edge and cluster, each with a `type` field.
+def write_jsonl(f, view, dg, clusters, version=None):
+    def write(record):
+        f.write(json.dumps(record, separators=(',', ':')))
+        f.write('\n')
+
+    write({'type': 'view', 'view': view.key, 'version': version})
+    for n in dg:
+        write(dict([('type', 'node')] + list(node_data(dg, n).items())))
+    for (source, sink) in dg.edges:
+        write(dict([('type', 'edge')] + list(edge_data(source, sink).items())))
+    for (label, nodes) in clusters:
+        write({'type': 'cluster', 'label': label, 'nodes': [issue_id(n) for n in nodes]})
+
+
+# The GraphML attributes of nodes, and their types. Lists (`labels` and the labels of the
+# node's `clusters`) are encoded as JSON strings.
+GRAPHML_NODE_KEYS = [
+    ('title', 'string'),
+    ('url', 'string'),
+    ('state', 'string'),
+    ('is_pr', 'boolean'),
+    ('labels', 'string'),
+    ('milestone', 'string'),
+    ('class', 'string'),
+    ('do_next', 'boolean'),
+    ('chain', 'int'),
+    ('slack', 'int'),
+    ('blocks', 'int'),
+    ('clusters', 'string'),
+]
+
+
+def _graphml_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    elif isinstance(value, list):
+        return escape(json.dumps(value))
+    else:
+        return escape(str(value))
+
+
+# Writes the graph to `f` as GraphML.
+def write_graphml(f, view, dg, clusters, version=None):
+    clusters_by_node = {}
+    for (label, nodes) in clusters:
+        for n in nodes:
+            clusters_by_node.setdefault(n, []).append(label)
+
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+    for (key, kind) in GRAPHML_NODE_KEYS:
+        f.write('  <key id="%s" for="node" attr.name="%s" attr.type="%s"/>\n' % (key, key, kind))
+    f.write('  <key id="is_open" for="edge" attr.name="is_open" attr.type="boolean"/>\n')
+    f.write('  <graph id=%s edgedefault="directed">\n' % quoteattr(view.key))
+    if version is not None:
+        f.write('    <desc>%s</desc>\n' % escape(version))
+
+    for n in dg:
+        data = node_data(dg, n)
+        data['clusters'] = clusters_by_node.get(n, [])
+        f.write('    <node id=%s>\n' % quoteattr(data['id']))
+        for (key, _) in GRAPHML_NODE_KEYS:
+            if data[key] is not None:
+                f.write('      <data key="%s">%s</data>\n' % (key, _graphml_value(data[key])))
+        f.write('    </node>\n')
+    for (source, sink) in dg.edges:
+        data = edge_data(source, sink)
+        f.write('    <edge source=%s target=%s><data key="is_open">%s</data></edge>\n' % (
+            quoteattr(data['source']),
+            quoteattr(data['target']),
+            _graphml_value(data['is_open']),
+        ))
+
+    f.write('  </graph>\n')
+    f.write('</graphml>\n')
+
+
+# The formats supported by EXPORT_FORMATS.
+EXPORTERS = {
+    'jsonl': write_jsonl,
+    'graphml': write_graphml,
+}
+
+
+class ViewServer(HTTPServer):
+    def __init__(self, address):
+        super().__init__(address, ViewRequestHandler)
+        self.disk = store.Store(store.DATA_STORE)
+        self.db = load_store()
+        self.cache = RenderCache(VIEW_CACHE_SIZE)
+
+    # Returns the data version to render from, reloading the in-memory copy of the data
+    # store if it has been synced since we loaded it.
+    def data_version(self):
+        version = self.disk.data_version()
+        if version != self.db.data_version():
+            print('Loading data version %s' % version)
+            self.db.close()
+            self.db = load_store()
+        return version
+
+    def render(self, view, fmt):
+        version = self.data_version()
+        key = (view.key, version, fmt)
+        data = self.cache.get(key)
+        if data is None:
+            if fmt == 'html':
+                data = to_html(view, self.render(view, 'svg').decode()).encode()
+            else:
+                (dg, clusters, _, report) = build(self.db, view)
+                if fmt == 'json':
+                    data = to_json(view, dg, clusters, report, version).encode()
+                elif fmt in EXPORTERS:
+                    f = io.StringIO()
+                    EXPORTERS[fmt](f, view, dg, clusters, version)
+                    data = f.getvalue().encode()
+                else:
+                    data = to_svg(to_agraph(dg, clusters)).encode()
+            self.cache.put(key, data)
+        return data
+
+
+class ViewRequestHandler(BaseHTTPRequestHandler):
+    CONTENT_TYPES = {
+        'svg': 'image/svg+xml',
+        'html': 'text/html; charset=utf-8',
+        'json': 'application/json',
+        'jsonl': 'application/jsonl',
+        'graphml': 'application/graphml+xml',
+        'css': 'text/css',
+    }
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        (name, _, fmt) = url.path.lstrip('/').rpartition('.')
+        if fmt not in self.CONTENT_TYPES:
+            return self.send_error(404)
+
+        if (name, fmt) == ('zcash-dag', 'css'):
+            # The stylesheet that the SVG and HTML outputs link to.
+            with open('public/zcash-dag.css', 'rb') as f:
+                return self.respond(fmt, f.read())
+
+        if name not in github.REPO_SETS or fmt == 'css':
+            return self.send_error(404)
+        try:
+            view = parse_view(name, url.query)
+            if len(view.workspaces) == 0:
+                raise ValueError('DAG_VIEW="%s" has no matching ZenHub workspaces' % name)
+            self.respond(fmt, self.server.render(view, fmt))
+        except (ValueError, nx.NetworkXError) as e:
+            self.send_error(400, explain=str(e))
+        except TimeoutError as e:
+            self.send_error(503, explain=str(e))
+
+    def respond(self, fmt, data):
+        self.send_response(200)
+        self.send_header('Content-Type', self.CONTENT_TYPES[fmt])
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve_views():
+    (host, _, port) = VIEW_SERVER.rpartition(':')
+    server = ViewServer((host or 'localhost', int(port)))
+    print('Serving views on http://%s:%d/' % server.server_address[:2])
+    server.serve_forever()
 
 
 if __name__ == '__main__':
-    if GITHUB_TOKEN and ZENHUB_TOKEN:
+    if len(EXPORT_FORMATS - set(EXPORTERS)) > 0:
+        print('Error: unsupported EXPORT_FORMATS: %s' % ','.join(sorted(EXPORT_FORMATS - set(EXPORTERS))))
+    elif EVENT_FEED or VIEW_SERVER:
+        if not store.DATA_STORE:
+            print('Please set the DATA_STORE environment variable.')
+        elif VIEW_SERVER:
+            serve_views()
+        else:
+            serve()
+    elif history.HISTORY_AT and not history.HISTORY_STORE:
+        print('Please set the HISTORY_STORE environment variable.')
+    elif (GITHUB_TOKEN and ZENHUB_TOKEN) or store.DATA_STORE or history.HISTORY_AT:
+        metrics.start('zcash-issue-dag')
         main()
+        metrics.finish()
     else:
-        print('Please set the GITHUB_TOKEN and ZENHUB_TOKEN environment variables.')
+        print('Please set the GITHUB_TOKEN and ZENHUB_TOKEN (or DATA_STORE) environment variables.')
@@ -3,7 +3,6 @@
 import os
 
 from helpers import zenhub
-from helpers.repos import ALL_REPOS
 
 ZENHUB_TOKEN = os.environ.get('ZENHUB_TOKEN')
 
@@ -16,6 +15,9 @@ def main():
     for repo in repos:
         print(repo)
 
+    # Also cache the IDs that `helpers/repos.py` doesn't have.
+    zenhub.cache_zh_ids(repos)
+
 
 if __name__ == '__main__':
     if ZENHUB_TOKEN: